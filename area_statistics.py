@@ -0,0 +1,336 @@
+"""
+Per-class area statistics accumulated while the prediction is written.
+
+Class pixel counts are taken from the cropped prediction blocks as they are
+written, so no second pass over the output raster is needed. Counts can be
+broken down by zones from a zone raster or a polygon layer.
+"""
+
+import csv
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+import rasterio
+from rasterio import features, windows
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_geom
+
+from tile_readers import grid_matches
+
+try:
+    import fiona
+except ImportError:
+    fiona = None
+
+SQ_METERS_PER_ACRE = 4046.8564224
+
+# Zone reported for pixels outside every zone, and when no zones are used
+NO_ZONE = 0
+
+# CRS of GeoJSON without a "crs" member, per RFC 7946
+GEOJSON_CRS = CRS.from_epsg(4326)
+
+
+class ZoneRaster:
+    """
+    Zones from an integer raster, read on the prediction grid.
+
+    Zone 0 is treated as "no zone".
+    """
+
+    def __init__(self, path, profile) -> None:
+        self.src = rasterio.open(path)
+        self.names = {}
+
+        if grid_matches(self.src, profile):
+            self._reader = self.src
+        else:
+            self._reader = WarpedVRT(
+                self.src,
+                crs=profile["crs"],
+                transform=profile["transform"],
+                width=profile["width"],
+                height=profile["height"],
+                resampling=Resampling.nearest,
+                nodata=NO_ZONE,
+            )
+
+    def read(self, window: windows.Window) -> np.ndarray:
+        return self._reader.read(1, window=window).astype(np.int64)
+
+    def close(self) -> None:
+        if self._reader is not self.src:
+            self._reader.close()
+        self.src.close()
+
+
+class ZonePolygons:
+    """
+    Zones from a polygon layer, rasterized onto each prediction block.
+
+    Each distinct `zone_field` value is assigned a zone id from 1, named
+    after the value, so a zone may be made of several polygons.
+    """
+
+    def __init__(self, shapes, transform, names: Optional[dict] = None) -> None:
+        """
+        Args:
+            shapes: Iterable of (geometry, zone_id) in the prediction CRS.
+            transform: Affine transform of the prediction grid.
+            names (dict, optional): Zone names keyed by zone id.
+        """
+        self.transform = transform
+        self.names = names or {}
+        self._shapes = []
+
+        for geometry, zone_id in shapes:
+            geometry_bounds = features.bounds(geometry)
+            self._shapes.append((geometry, zone_id, geometry_bounds))
+
+    @classmethod
+    def from_file(cls, path, zone_field: str, transform, crs) -> "ZonePolygons":
+        """
+        Load a polygon layer. GeoJSON is read directly; other formats need fiona.
+
+        GeoJSON without a (pre RFC 7946) "crs" member is in WGS84. Other
+        layers without a CRS are assumed to be in the prediction CRS.
+        """
+        path = Path(path)
+
+        if path.suffix.lower() in (".geojson", ".json"):
+            with path.open() as f:
+                collection = json.load(f)
+            layer_crs = collection.get("crs", {}).get("properties", {}).get("name")
+            layer_crs = CRS.from_user_input(layer_crs) if layer_crs else GEOJSON_CRS
+            layer_features = collection["features"]
+        else:
+            if fiona is None:
+                raise ImportError(
+                    f"Reading {path.suffix} polygon layers requires fiona. "
+                    "Install fiona or convert the layer to GeoJSON."
+                )
+            with fiona.open(path) as layer:
+                layer_crs = CRS.from_user_input(layer.crs) if layer.crs else crs
+                layer_features = [
+                    {"geometry": dict(f["geometry"]), "properties": dict(f["properties"])}
+                    for f in layer
+                ]
+
+        zone_ids = {}
+        shapes = []
+        for feature in layer_features:
+            geometry = feature["geometry"]
+            if layer_crs != crs:
+                geometry = transform_geom(layer_crs, crs, geometry)
+
+            name = str(feature["properties"][zone_field])
+            zone_id = zone_ids.setdefault(name, len(zone_ids) + 1)
+            shapes.append((geometry, zone_id))
+
+        names = {zone_id: name for name, zone_id in zone_ids.items()}
+
+        return cls(shapes, transform, names=names)
+
+    def read(self, window: windows.Window) -> np.ndarray:
+        height, width = int(window.height), int(window.width)
+        left, bottom, right, top = windows.bounds(window, self.transform)
+
+        # Only rasterize the polygons overlapping this block
+        shapes = [
+            (geometry, zone_id)
+            for geometry, zone_id, (x0, y0, x1, y1) in self._shapes
+            if x0 < right and x1 > left and y0 < top and y1 > bottom
+        ]
+        if not shapes:
+            return np.full((height, width), NO_ZONE, dtype=np.int32)
+
+        return features.rasterize(
+            shapes,
+            out_shape=(height, width),
+            transform=windows.transform(window, self.transform),
+            fill=NO_ZONE,
+            dtype=np.int32,
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class ClassAreaStatistics:
+    """
+    Accumulates per-class pixel counts, optionally per zone, from the
+    prediction blocks written by `generate_prediction`.
+
+    Counts are taken before reclassification; counts after reclassification
+    are derived from them with `reclass_map`, since each class maps to
+    exactly one reclassified value.
+    """
+
+    def __init__(
+        self,
+        transform,
+        crs=None,
+        zones=None,
+        reclass_map: Optional[dict] = None,
+        num_classes: int = 256,
+    ) -> None:
+        """
+        Args:
+            transform: Affine transform of the prediction grid.
+            crs: CRS of the prediction grid, used for its linear units.
+            zones: Optional ZoneRaster or ZonePolygons.
+            reclass_map (dict, optional): Class to reclassified value mapping.
+            num_classes (int): Number of possible class values.
+        """
+        self.transform = transform
+        self.crs = crs
+        self.zones = zones
+        self.reclass_map = reclass_map
+        self.num_classes = num_classes
+
+        self._counts = {}
+
+    @property
+    def pixel_area(self) -> float:
+        """
+        Area of one pixel in square CRS units.
+        """
+        t = self.transform
+        return abs(t.a * t.e - t.b * t.d)
+
+    @property
+    def acres_per_pixel(self) -> float:
+        meters_per_unit = 1.0
+        if self.crs is not None and CRS.from_user_input(self.crs).is_projected:
+            _, meters_per_unit = CRS.from_user_input(self.crs).linear_units_factor
+
+        return self.pixel_area * meters_per_unit**2 / SQ_METERS_PER_ACRE
+
+    def add(self, window: windows.Window, classes: np.ndarray) -> None:
+        """
+        Count the class values of one block written at `window`.
+        """
+        classes = classes.ravel()
+
+        if self.zones is None:
+            self._add_counts(NO_ZONE, np.bincount(classes, minlength=self.num_classes))
+            return
+
+        zones = self.zones.read(window).ravel()
+        zone_ids = np.unique(zones)
+
+        if len(zone_ids) == 1:
+            counts = np.bincount(classes, minlength=self.num_classes)
+            self._add_counts(int(zone_ids[0]), counts)
+            return
+
+        for zone_id in zone_ids:
+            counts = np.bincount(classes[zones == zone_id], minlength=self.num_classes)
+            self._add_counts(int(zone_id), counts)
+
+    def _add_counts(self, zone_id: int, counts: np.ndarray) -> None:
+        if zone_id not in self._counts:
+            self._counts[zone_id] = np.zeros(self.num_classes, dtype=np.int64)
+        self._counts[zone_id] += counts[: self.num_classes]
+
+    def pixel_counts(self, reclassified: bool = False) -> dict:
+        """
+        Return the pixel counts per class, keyed by zone id.
+        """
+        if not reclassified:
+            return {zone_id: counts.copy() for zone_id, counts in self._counts.items()}
+
+        if self.reclass_map is None:
+            raise ValueError("No reclass map given for reclassified statistics.")
+
+        reclassified_counts = {}
+        for zone_id, counts in self._counts.items():
+            new_counts = np.zeros(self.num_classes, dtype=np.int64)
+            for value, count in enumerate(counts):
+                if count:
+                    new_counts[self.reclass_map.get(value, value)] += count
+            reclassified_counts[zone_id] = new_counts
+
+        return reclassified_counts
+
+    def rows(self) -> list:
+        """
+        Return the statistics as a list of records, one per zone, stage and class.
+        """
+        stages = [("class", False)]
+        if self.reclass_map is not None:
+            stages.append(("reclassified", True))
+
+        names = getattr(self.zones, "names", {})
+        acres_per_pixel = self.acres_per_pixel
+
+        rows = []
+        for stage, reclassified in stages:
+            for zone_id, counts in sorted(self.pixel_counts(reclassified).items()):
+                for value in np.flatnonzero(counts):
+                    pixels = int(counts[value])
+                    rows.append(
+                        {
+                            "zone": zone_id,
+                            "zone_name": names.get(zone_id, ""),
+                            "stage": stage,
+                            "value": int(value),
+                            "pixels": pixels,
+                            "acres": pixels * acres_per_pixel,
+                        }
+                    )
+
+        return rows
+
+    def write(self, path) -> None:
+        """
+        Write the statistics to a CSV file, or JSON if `path` ends in .json.
+        """
+        path = Path(path)
+        rows = self.rows()
+
+        if path.suffix.lower() == ".json":
+            with path.open("w") as f:
+                json.dump(
+                    {
+                        "pixel_area": self.pixel_area,
+                        "acres_per_pixel": self.acres_per_pixel,
+                        "statistics": rows,
+                    },
+                    f,
+                    indent=2,
+                )
+            return
+
+        with path.open("w", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=["zone", "zone_name", "stage", "value", "pixels", "acres"]
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def statistics_path_for(out_prediction_tif, suffix: str = ".csv") -> Path:
+    """
+    Return the default statistics sidecar path for a prediction output.
+    """
+    out_prediction_tif = Path(out_prediction_tif)
+    return out_prediction_tif.with_name(f"{out_prediction_tif.stem}_class_areas{suffix}")
+
+
+def open_zones(path, profile, zone_field: Optional[str] = None):
+    """
+    Open a zone raster (.tif) or polygon layer on the prediction grid.
+    """
+    if Path(path).suffix.lower() in (".tif", ".tiff"):
+        return ZoneRaster(path, profile)
+
+    if not zone_field:
+        raise ValueError("A zone field is required for polygon zone layers.")
+
+    return ZonePolygons.from_file(path, zone_field, profile["transform"], profile["crs"])
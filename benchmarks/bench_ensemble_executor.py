@@ -0,0 +1,133 @@
+"""
+Ensemble executor scaling benchmark.
+
+Measures prediction throughput for 1, 2 and 3 ensemble members, run one
+after another and concurrently, for each core count. Either way all
+members share the process's intra-op thread pool of one thread per core.
+Each configuration runs in its own process pinned to its cores, because
+TensorFlow's thread pools can only be sized before it is initialized.
+
+Run with the real models with:
+    python -m benchmarks.bench_ensemble_executor --cores 4 8 16
+
+or, without model weights, with synthetic models with:
+    python -m benchmarks.bench_ensemble_executor --synthetic --cores 1 2 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from ensemble_executor import EnsembleExecutor, available_cores, configure_threads
+from ensemble_reducer import EnsembleReducer
+
+
+def load_members(num_members, synthetic):
+    if synthetic:
+        from benchmarks.bench_quick_look import synthetic_model
+
+        return [synthetic_model() for _ in range(num_members)]
+
+    from generate_prediction import PRE_TRAINED_MODELS
+
+    models = PRE_TRAINED_MODELS[:num_members]
+    for model in models:
+        model.load()
+    return models
+
+
+def run_worker(args):
+    """
+    Time one configuration and print the result as JSON.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, range(args.cores))
+
+    # All members share the process's intra-op pool of one thread per core
+    configure_threads(1 if args.sequential else args.members, args.cores)
+
+    models = load_members(args.members, args.synthetic)
+    executor = EnsembleExecutor(models, max_workers=1 if args.sequential else args.members)
+    reducer = EnsembleReducer(args.batch_size)
+
+    rng = np.random.default_rng(0)
+    batch_input = rng.integers(0, 255, (args.batch_size, 256, 256, 4), dtype=np.uint8)
+
+    # Warm up, so graph tracing is not timed
+    reducer.reset()
+    executor.run(batch_input, reducer)
+
+    start = time.perf_counter()
+    for _ in range(args.batches):
+        reducer.reset()
+        executor.run(batch_input, reducer)
+        reducer.argmax()
+    elapsed = time.perf_counter() - start
+
+    executor.close()
+    print(json.dumps({"tiles_per_second": args.batches * args.batch_size / elapsed}))
+
+
+def measure(args, cores, members, sequential):
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_ensemble_executor",
+        "--worker",
+        "--cores",
+        str(cores),
+        "--members",
+        str(members),
+        "--batches",
+        str(args.batches),
+        "--batch-size",
+        str(args.batch_size),
+    ]
+    if sequential:
+        command.append("--sequential")
+    if args.synthetic:
+        command.append("--synthetic")
+
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])["tiles_per_second"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cores", type=int, nargs="+", default=[available_cores()])
+    parser.add_argument("--members", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--sequential", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.cores = args.cores[0]
+        args.members = args.members[0]
+        run_worker(args)
+        return
+
+    print("cores  members  sequential tiles/s  concurrent tiles/s  speedup")
+    for cores in args.cores:
+        if cores > available_cores():
+            print(f"{cores:5d}  skipped, only {available_cores()} cores available")
+            continue
+
+        for members in args.members:
+            sequential = measure(args, cores, members, sequential=True)
+            concurrent = measure(args, cores, members, sequential=False)
+            print(
+                f"{cores:5d}  {members:7d}  {sequential:18.1f}  {concurrent:18.1f}"
+                f"  {concurrent / sequential:6.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
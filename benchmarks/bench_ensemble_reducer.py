@@ -0,0 +1,143 @@
+"""
+Memory benchmark for reducing ensemble predictions.
+
+Compares the peak memory of stacking every model output and taking the
+mean and argmax over full tiles against the EnsembleReducer running sum,
+for a growing number of ensemble members, and measures the EnsembleExecutor
+running the members concurrently into the reducer. Exits with an error if
+the reducer's peak memory grows with the ensemble size, or the executor's
+grows beyond `--max-workers` members, by default the number of members
+`generate_prediction` runs at once.
+
+Run with:
+    python -m benchmarks.bench_ensemble_reducer
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from ensemble_executor import DEFAULT_MAX_WORKERS, EnsembleExecutor
+from ensemble_reducer import EnsembleReducer
+
+
+def fake_model_output(batch_size, num_classes, tile_size, seed):
+    # A fresh array per call, like model.predict
+    rng = np.random.default_rng(seed)
+    return rng.random((batch_size, tile_size, tile_size, num_classes), dtype=np.float32)
+
+
+def reduce_stacked(num_members, batch_size, num_classes, tile_size):
+    batch_preds = []
+    for seed in range(num_members):
+        batch_preds.append(fake_model_output(batch_size, num_classes, tile_size, seed))
+
+    avg_preds = np.mean(batch_preds, axis=0)
+    batch_argmax = np.argmax(avg_preds, axis=3)
+
+    return batch_argmax[:, 64:192, 64:192].astype(np.uint8)
+
+
+def reduce_streaming(reducer, num_members, batch_size, num_classes, tile_size):
+    reducer.reset()
+    for seed in range(num_members):
+        reducer.add(fake_model_output(batch_size, num_classes, tile_size, seed))
+
+    return reducer.argmax()
+
+
+class FakeMember:
+    def __init__(self, num_classes, tile_size, seed):
+        self.num_classes = num_classes
+        self.tile_size = tile_size
+        self.seed = seed
+
+    def predict_prepared_batch(self, batch_input):
+        preds = fake_model_output(len(batch_input), self.num_classes, self.tile_size, self.seed)
+        # Hold the output for a while, as a model still running would
+        time.sleep(0.05)
+        return preds
+
+
+def reduce_concurrent(reducer, num_members, batch_size, num_classes, tile_size, max_workers):
+    batch_input = np.zeros((batch_size, tile_size, tile_size, 4), dtype=np.uint8)
+    members = [FakeMember(num_classes, tile_size, seed) for seed in range(num_members)]
+
+    with EnsembleExecutor(members, max_workers=max_workers) as executor:
+        reducer.reset()
+        executor.run(batch_input, reducer)
+
+    return reducer.argmax()
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--num-classes", type=int, default=10)
+    parser.add_argument("--tile-size", type=int, default=256)
+    parser.add_argument("--max-members", type=int, default=6)
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    args = parser.parse_args()
+
+    shape = (args.batch_size, args.num_classes, args.tile_size)
+
+    # Allocate the reusable buffers up front; they are created once per run
+    reducer = EnsembleReducer(args.batch_size, args.tile_size, num_classes=args.num_classes)
+    reduce_streaming(reducer, 1, *shape)
+
+    print(f"batch_size={args.batch_size} num_classes={args.num_classes}")
+    print(f"reducer buffers: {reducer.nbytes / 2**20:.1f} MiB")
+    print(
+        f"{'members':>7} | {'stacked peak MiB':>16} {'time s':>7} | "
+        f"{'reducer peak MiB':>16} {'time s':>7} | {'executor peak MiB':>17} {'time s':>7}"
+    )
+
+    streaming_peaks = []
+    executor_peaks = []
+    for num_members in range(1, args.max_members + 1):
+        stacked_peak, stacked_time = measure(reduce_stacked, num_members, *shape)
+        streaming_peak, streaming_time = measure(
+            reduce_streaming, reducer, num_members, *shape
+        )
+        streaming_peaks.append(streaming_peak)
+
+        executor_peak, executor_time = measure(
+            reduce_concurrent, reducer, num_members, *shape, args.max_workers
+        )
+        # Fewer members than workers hold fewer outputs at once
+        if num_members >= args.max_workers:
+            executor_peaks.append(executor_peak)
+
+        print(
+            f"{num_members:>7} | {stacked_peak / 2**20:>16.1f} {stacked_time:>7.3f} | "
+            f"{streaming_peak / 2**20:>16.1f} {streaming_time:>7.3f} | "
+            f"{executor_peak / 2**20:>17.1f} {executor_time:>7.3f}"
+        )
+
+    # Allow for small allocator noise between runs
+    if max(streaming_peaks) > 1.01 * min(streaming_peaks):
+        print("FAIL: reducer peak memory grows with the ensemble size")
+        sys.exit(1)
+
+    if executor_peaks and max(executor_peaks) > 1.05 * min(executor_peaks):
+        print("FAIL: executor peak memory grows with the ensemble size")
+        sys.exit(1)
+
+    print("OK: reducer and executor peak memory are independent of the ensemble size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Read benchmark for memory mapped, uncompressed GeoTIFF inputs.
+
+For striped and tiled uncompressed pixel-interleaved rasters, compares
+reading tiles with rasterio and preprocessing them with prepare_tile_batch
+against reading them from a MemmapRaster and preprocessing them with
+normalize_tiles, and the read step alone. Reports wall and CPU time, and
+the bytes of new tile arrays created by the read step.
+
+Run with:
+    python -m benchmarks.bench_memmap_reads --size 4096
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from generate_prediction import get_tiles
+from pre_trained_model import PreTrainedModel, normalize_tiles
+from tile_readers import MemmapRaster, iter_direct_tiles, iter_memmap_tiles, select_tiles
+
+
+def write_uncompressed_raster(path, size, tiled):
+    rng = np.random.default_rng(0)
+    layout = {"tiled": True, "blockxsize": 256, "blockysize": 256} if tiled else {}
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=size,
+        width=size,
+        count=4,
+        dtype="uint16",
+        crs="EPSG:2230",
+        transform=from_origin(6200000, 2300000, 0.5, 0.5),
+        interleave="pixel",
+        **layout,
+    ) as dst:
+        for row in range(0, size, 1024):
+            height = min(1024, size - row)
+            block = rng.integers(1, 2**16, (4, height, size), dtype=np.uint16)
+            dst.write(block, window=((row, row + height), (0, size)))
+
+
+def run(tiles, preprocess, batch_size, shares_memory=None):
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    copied_bytes = 0
+    batch = []
+
+    for _, tile_img in tiles:
+        if shares_memory is None or not shares_memory(tile_img):
+            copied_bytes += tile_img.nbytes
+
+        batch.append(tile_img)
+        if len(batch) == batch_size:
+            preprocess(batch)
+            batch.clear()
+
+    if batch:
+        preprocess(batch)
+
+    return time.perf_counter() - wall_start, time.process_time() - cpu_start, copied_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=4096, help="Raster width and height")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    # Only preprocessing is used; no model weights are loaded
+    model = PreTrainedModel("unused")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for tiled in (False, True):
+            layout = "tiled" if tiled else "striped"
+            input_tif = Path(tmp_dir) / f"{layout}.tif"
+            write_uncompressed_raster(input_tif, args.size, tiled)
+
+            with rasterio.open(input_tif) as src:
+                tile_windows = select_tiles([w for w, _ in get_tiles(src, stride=128)])
+                image = MemmapRaster.open(src)
+
+                # Read only: batches stacked into one array, no preprocessing
+                rasterio_read = run(
+                    iter_direct_tiles(src, tile_windows), np.asarray, args.batch_size
+                )
+                memmap_read = run(
+                    iter_memmap_tiles(image, tile_windows),
+                    np.asarray,
+                    args.batch_size,
+                    shares_memory=lambda tile: np.shares_memory(tile, image.array),
+                )
+
+                rasterio_result = run(
+                    iter_direct_tiles(src, tile_windows),
+                    model.prepare_tile_batch,
+                    args.batch_size,
+                )
+                memmap_result = run(
+                    iter_memmap_tiles(image, tile_windows),
+                    lambda batch: normalize_tiles(batch, channels_last=True),
+                    args.batch_size,
+                    shares_memory=lambda tile: np.shares_memory(tile, image.array),
+                )
+
+            print(f"{layout}: {args.size}x{args.size} uint16, {len(tile_windows)} tiles")
+            for name, (wall, cpu, copied) in (
+                ("rasterio read", rasterio_read),
+                ("memmap read", memmap_read),
+                ("rasterio + prepare_tile", rasterio_result),
+                ("memmap + normalize_tiles", memmap_result),
+            ):
+                print(
+                    f"  {name:<25} wall {wall:6.2f} s  cpu {cpu:6.2f} s  "
+                    f"read copies {copied / 2**20:8.1f} MiB"
+                )
+
+            del image
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Normalization accuracy harness.
+
+Predicts a scene with per-tile normalization and with scene normalization
+and reports for each mode:
+
+- the time taken, including computing the scene statistics,
+- seam strength: how much more often the class changes between adjacent
+  pixels across tile crop boundaries than elsewhere (1.0 means no seams),
+- pixel accuracy against a reference class raster, if one is given,
+
+and the fraction of pixels on which the two modes agree.
+
+Run on a real mosaic with:
+    python -m benchmarks.bench_normalization --input mosaic.tif --reference labels.tif
+
+or, without model weights, on a synthetic scene and model with:
+    python -m benchmarks.bench_normalization --synthetic
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+
+from benchmarks.bench_quick_look import synthetic_model, write_synthetic_scene
+from generate_prediction import (
+    ENSEMBLE_MODEL_NAME,
+    PRE_TRAINED_MODELS,
+    estimate_valid_windows,
+    generate_prediction,
+    select_models,
+)
+from scene_statistics import scene_band_scales
+
+# Edge-aware crops start at the raster origin, every 128 pixels
+CROP_SIZE = 128
+
+
+def seam_strength(classes):
+    """
+    Return the class change rate between adjacent pixels across crop
+    boundaries relative to the rate elsewhere.
+    """
+    valid = classes != 255
+
+    boundary = []
+    interior = []
+    for axis in (0, 1):
+        changes = np.diff(classes, axis=axis) != 0
+        both_valid = np.logical_and(
+            np.take(valid, range(1, classes.shape[axis]), axis=axis),
+            np.take(valid, range(0, classes.shape[axis] - 1), axis=axis),
+        )
+
+        # Difference i lies between pixels i and i + 1
+        at_boundary = (np.arange(1, classes.shape[axis]) % CROP_SIZE) == 0
+        shape = [1, 1]
+        shape[axis] = -1
+        at_boundary = at_boundary.reshape(shape)
+
+        boundary.append(changes[both_valid & at_boundary])
+        interior.append(changes[both_valid & ~at_boundary])
+
+    interior_rate = np.concatenate(interior).mean()
+    boundary_rate = np.concatenate(boundary).mean()
+
+    if interior_rate == 0:
+        return float("inf") if boundary_rate else 1.0
+    return float(boundary_rate / interior_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", help="Input mosaic")
+    parser.add_argument("--reference", help="Reference class raster on the input grid")
+    parser.add_argument("--model", default=ENSEMBLE_MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--size", type=int, default=2048, help="Synthetic scene size")
+    args = parser.parse_args()
+
+    if not args.input and not args.synthetic:
+        parser.error("Give an --input mosaic or use --synthetic.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+
+        if args.synthetic:
+            input_tif = tmp_dir / "input.tif"
+            # Fields that don't line up with the crop boundaries
+            write_synthetic_scene(input_tif, args.size, field_size=100)
+            models = [synthetic_model()]
+        else:
+            input_tif = Path(args.input)
+            models = select_models(PRE_TRAINED_MODELS, args.model)
+            for model in models:
+                model.load()
+
+        reference = None
+        if args.reference:
+            with rasterio.open(args.reference) as ref:
+                reference = ref.read(1)
+
+        results = {}
+        with rasterio.open(input_tif) as src:
+            valid_windows = estimate_valid_windows(src, edge_aware=True)
+
+            for mode in ("tile", "scene"):
+                start = time.perf_counter()
+
+                scales = None
+                if mode == "scene":
+                    scales = scene_band_scales(src)
+
+                out_tif = tmp_dir / f"{mode}.tif"
+                generate_prediction(
+                    src,
+                    src.profile.copy(),
+                    out_tif,
+                    models,
+                    valid_windows,
+                    stride=128,
+                    batch_size=args.batch_size,
+                    edge_aware=True,
+                    band_scales=scales,
+                )
+                elapsed = time.perf_counter() - start
+
+                with rasterio.open(out_tif) as dst:
+                    results[mode] = (elapsed, dst.read(1))
+
+        print("mode    time (s)  seam strength  accuracy")
+        for mode, (elapsed, classes) in results.items():
+            accuracy = ""
+            if reference is not None:
+                valid = classes != 255
+                accuracy = f"{np.mean(classes[valid] == reference[valid]):8.1%}"
+            print(f"{mode:6s}  {elapsed:8.1f}  {seam_strength(classes):13.2f}  {accuracy}")
+
+        tile_classes, scene_classes = results["tile"][1], results["scene"][1]
+        valid = (tile_classes != 255) & (scene_classes != 255)
+        print(f"modes agree on {np.mean(tile_classes[valid] == scene_classes[valid]):.1%} of pixels")
+
+
+if __name__ == "__main__":
+    main()
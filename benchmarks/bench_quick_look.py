@@ -0,0 +1,143 @@
+"""
+Quick-look benchmark.
+
+Runs a full resolution prediction and a quick look with the same single
+model and reports the speedup and the fraction of quick-look pixels that
+agree with the full resolution class at the same location.
+
+Run on a real mosaic with:
+    python -m benchmarks.bench_quick_look --input mosaic.tif --model model_1
+
+or, without model weights, on a synthetic scene and model with:
+    python -m benchmarks.bench_quick_look --synthetic
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from generate_prediction import (
+    PRE_TRAINED_MODELS,
+    estimate_valid_windows,
+    generate_prediction,
+    select_models,
+)
+from pre_trained_model import PreTrainedModel
+from quick_look import generate_quick_look
+
+
+def write_synthetic_scene(path, size, field_size=64):
+    # Smooth random fields, so neighbouring pixels look alike as in imagery
+    rng = np.random.default_rng(0)
+    coarse = rng.integers(200, 4000, (4, size // field_size + 1, size // field_size + 1))
+    data = np.repeat(np.repeat(coarse, field_size, axis=1), field_size, axis=2)[
+        :, :size, :size
+    ]
+    data = (data + rng.integers(0, 200, data.shape)).astype(np.uint16)
+
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=size,
+        width=size,
+        count=4,
+        dtype="uint16",
+        crs="EPSG:2230",
+        transform=from_origin(6200000, 2300000, 0.5, 0.5),
+        nodata=0,
+        tiled=True,
+        compress="deflate",
+    ) as dst:
+        dst.write(data)
+
+
+def synthetic_model():
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(0)
+    inputs = tf.keras.Input((256, 256, 4))
+    x = tf.keras.layers.Rescaling(1 / 255.0)(inputs)
+    x = tf.keras.layers.Conv2D(16, 5, padding="same", activation="relu")(x)
+    x = tf.keras.layers.Conv2D(10, 5, padding="same", activation="softmax")(x)
+
+    model = PreTrainedModel("synthetic/saved_model")
+    model._model = tf.keras.Model(inputs, x)
+    return model
+
+
+def agreement(full_tif, quick_look_tif, scale):
+    with rasterio.open(full_tif) as full, rasterio.open(quick_look_tif) as quick:
+        quick_classes = quick.read(1)
+        # Full resolution class at the center of each quick-look pixel
+        full_classes = full.read(1)[scale // 2 :: scale, scale // 2 :: scale]
+        full_classes = full_classes[: quick_classes.shape[0], : quick_classes.shape[1]]
+        quick_classes = quick_classes[: full_classes.shape[0], : full_classes.shape[1]]
+
+    valid = (full_classes != 255) & (quick_classes != 255)
+    return float(np.mean(full_classes[valid] == quick_classes[valid])), int(valid.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", help="Input mosaic")
+    parser.add_argument("--model", default=PRE_TRAINED_MODELS[0].trial_name)
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--size", type=int, default=2048, help="Synthetic scene size")
+    args = parser.parse_args()
+
+    if not args.input and not args.synthetic:
+        parser.error("Give an --input mosaic or use --synthetic.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+
+        if args.synthetic:
+            input_tif = tmp_dir / "input.tif"
+            write_synthetic_scene(input_tif, args.size)
+            model = synthetic_model()
+        else:
+            input_tif = Path(args.input)
+            (model,) = select_models(PRE_TRAINED_MODELS, args.model)
+            model.load()
+
+        with rasterio.open(input_tif) as src:
+            start = time.perf_counter()
+            generate_prediction(
+                src,
+                src.profile.copy(),
+                tmp_dir / "full.tif",
+                [model],
+                estimate_valid_windows(src),
+                stride=128,
+                batch_size=args.batch_size,
+            )
+            full_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            generate_quick_look(
+                src,
+                tmp_dir / "quick_look.tif",
+                model,
+                scale=args.scale,
+                batch_size=args.batch_size,
+            )
+            quick_time = time.perf_counter() - start
+
+        match, pixels = agreement(tmp_dir / "full.tif", tmp_dir / "quick_look.tif", args.scale)
+
+        print(f"model {model.trial_name}, scale {args.scale}")
+        print(f"full resolution: {full_time:8.1f} s")
+        print(f"quick look:      {quick_time:8.1f} s  ({full_time / quick_time:.1f}x faster)")
+        print(f"agreement:       {match:8.1%} of {pixels} quick-look pixels")
+
+
+if __name__ == "__main__":
+    main()
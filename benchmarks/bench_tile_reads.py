@@ -0,0 +1,118 @@
+"""
+Tile read throughput benchmark.
+
+Compares tiles read per second for:
+- the previous per-tile WarpedVRT reads against direct reads, when the
+  source already matches the target grid, and
+- per-tile WarpedVRT reads against chunked, multithreaded warping, when
+  the source must be reprojected from EPSG:2875 to EPSG:2230.
+
+Run with:
+    python -m benchmarks.bench_tile_reads --size 4096
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import calculate_default_transform
+
+from generate_prediction import get_tiles
+from tile_readers import iter_direct_tiles, iter_warped_tiles
+
+
+def write_test_raster(path, size, crs):
+    rng = np.random.default_rng(0)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=size,
+        width=size,
+        count=4,
+        dtype="uint16",
+        crs=crs,
+        transform=from_origin(6200000, 2300000, 0.5, 0.5),
+        nodata=0,
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+        compress="deflate",
+    ) as dst:
+        for row in range(0, size, 1024):
+            height = min(1024, size - row)
+            block = rng.integers(1, 2**16, (4, height, size), dtype=np.uint16)
+            dst.write(block, window=((row, row + height), (0, size)))
+
+
+def iter_per_tile_vrt(src, profile, tile_windows):
+    # The previous behavior: every tile read goes through the warper
+    with WarpedVRT(src, **profile) as vrt:
+        for window in tile_windows:
+            yield window, vrt.read((1, 2, 3, 4), window=window)
+
+
+def tiles_per_second(tiles):
+    start = time.perf_counter()
+    count = sum(1 for _ in tiles)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=4096, help="Raster width and height")
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_tif = Path(tmp_dir) / "input.tif"
+        write_test_raster(input_tif, args.size, "EPSG:2875")
+
+        with rasterio.open(input_tif) as src:
+            tile_windows = [w for w, _ in get_tiles(src, stride=128)]
+            print(f"{args.size}x{args.size} raster, {len(tile_windows)} tiles")
+
+            # Same grid: no reprojection needed
+            profile = src.profile.copy()
+            vrt_rate = tiles_per_second(iter_per_tile_vrt(src, profile, tile_windows))
+            direct_rate = tiles_per_second(iter_direct_tiles(src, tile_windows))
+            print(f"same grid    per-tile VRT: {vrt_rate:8.1f} tiles/s")
+            print(
+                f"same grid    direct read:  {direct_rate:8.1f} tiles/s "
+                f"({direct_rate / vrt_rate:.2f}x)"
+            )
+
+            # EPSG:2875 -> EPSG:2230 reprojection
+            transform, width, height = calculate_default_transform(
+                src.crs, "EPSG:2230", src.width, src.height, *src.bounds,
+                resolution=src.res,
+            )
+            profile.update(
+                crs=rasterio.crs.CRS.from_epsg(2230),
+                transform=transform,
+                width=width,
+                height=height,
+            )
+            warp_windows = [
+                w for w in tile_windows if w.col_off + w.width <= width
+                and w.row_off + w.height <= height
+            ]
+
+            vrt_rate = tiles_per_second(iter_per_tile_vrt(src, profile, warp_windows))
+            chunk_rate = tiles_per_second(
+                iter_warped_tiles(src, profile, warp_windows, chunk_size=args.chunk_size)
+            )
+            print(f"reprojected  per-tile VRT: {vrt_rate:8.1f} tiles/s")
+            print(
+                f"reprojected  chunked warp: {chunk_rate:8.1f} tiles/s "
+                f"({chunk_rate / vrt_rate:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Input pipeline benchmark for the tile store.
+
+Compares the time to produce model-ready batches by reading and
+preprocessing tiles from a compressed GeoTIFF, as `generate_prediction`
+does, against streaming them from a pre-built TileStore.
+
+Run with:
+    python -m benchmarks.bench_tile_store --size 4096
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+
+from benchmarks.bench_tile_reads import write_test_raster
+from generate_prediction import estimate_valid_windows
+from pre_trained_model import PreTrainedModel
+from tile_readers import iter_source_tiles, select_tiles
+from tile_store import TileStore, write_tile_store
+
+
+def geotiff_batches(src, profile, valid_windows, batch_size, model):
+    batch_imgs = []
+    for _, tile_img in iter_source_tiles(src, profile, select_tiles(valid_windows)):
+        if np.average(tile_img) == profile["nodata"]:
+            continue
+
+        batch_imgs.append(tile_img)
+        if len(batch_imgs) == batch_size:
+            yield model.prepare_tile_batch(batch_imgs)
+            batch_imgs.clear()
+
+    if batch_imgs:
+        yield model.prepare_tile_batch(batch_imgs)
+
+
+def store_batches(store, batch_size):
+    for _, batch in store.iter_batches(batch_size):
+        # Touch the pages, as feeding the model would
+        yield np.array(batch)
+
+
+def time_batches(batches):
+    start = time.perf_counter()
+    tiles = sum(len(batch) for batch in batches)
+    return tiles, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=4096, help="Raster width and height")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    # Only preprocessing is used; no model weights are loaded
+    model = PreTrainedModel("unused")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_tif = Path(tmp_dir) / "input.tif"
+        write_test_raster(input_tif, args.size, "EPSG:2230")
+
+        with rasterio.open(input_tif) as src:
+            profile = src.profile.copy()
+            valid_windows = estimate_valid_windows(src)
+
+            start = time.perf_counter()
+            write_tile_store(src, profile, valid_windows, Path(tmp_dir) / "store")
+            build_time = time.perf_counter() - start
+
+            tiles, geotiff_time = time_batches(
+                geotiff_batches(src, profile, valid_windows, args.batch_size, model)
+            )
+
+        store = TileStore(Path(tmp_dir) / "store")
+        store_tiles, store_time = time_batches(store_batches(store, args.batch_size))
+        assert store_tiles == tiles
+
+        print(f"{args.size}x{args.size} uint16 deflate raster, {tiles} tiles")
+        print(f"store build (one time): {build_time:7.2f} s")
+        print(f"GeoTIFF + prepare_tile: {geotiff_time:7.2f} s  {tiles / geotiff_time:8.1f} tiles/s")
+        print(
+            f"tile store:             {store_time:7.2f} s  {tiles / store_time:8.1f} tiles/s "
+            f"({geotiff_time / store_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
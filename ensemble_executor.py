@@ -0,0 +1,146 @@
+"""
+Concurrent execution of the ensemble members on a shared batch.
+
+Each batch is normalized once and the same uint8 input is sent to every
+model on its own thread. TensorFlow releases the GIL while it runs a graph,
+so the members run in parallel, sharing the process's intra-op thread pool.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+from typing import Optional
+
+# Members run at once by default. Each running member holds one full model
+# output, so this, not the ensemble size, bounds the outputs' peak memory.
+DEFAULT_MAX_WORKERS = 2
+
+
+def available_cores() -> int:
+    """
+    Return the number of CPU cores this process may run on.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_threads(num_members: int, num_cores: Optional[int] = None) -> bool:
+    """
+    Let TensorFlow run the graphs of `num_members` models at the same time.
+
+    TensorFlow has a single intra-op thread pool per process, shared by all
+    members, so it is left at its default of one thread per core; shrinking
+    it would limit the whole ensemble, not each member. Only the inter-op
+    pool is raised to at least one lane per member. Must be called before
+    TensorFlow runs its first operation.
+
+    Args:
+        num_members (int): Number of models run concurrently.
+        num_cores (int, optional): Cores available to the process. Defaults
+            to the cores available to this process.
+
+    Returns:
+        bool: False if TensorFlow was already initialized and the settings
+        could not be changed.
+    """
+    import tensorflow as tf
+
+    num_cores = num_cores or available_cores()
+
+    try:
+        tf.config.threading.set_inter_op_parallelism_threads(max(num_members, num_cores))
+    except RuntimeError:
+        # TensorFlow keeps its thread pools once initialized
+        return False
+
+    return True
+
+
+class EnsembleExecutor:
+    """
+    Runs `predict_prepared_batch` of every model concurrently on the same
+    batch and gathers the outputs into an EnsembleReducer.
+
+    Outputs are added to the reducer in model order, as soon as the member
+    and all members before it have finished, and released right after. The
+    float32 sums are therefore the same as running the members one after
+    another, whichever member finishes first, and at most `max_workers`
+    outputs exist at once.
+
+    Usage, per batch:
+        reducer.reset()
+        executor.run(normalize_tiles(batch_imgs), reducer)
+        classes = reducer.argmax()
+    """
+
+    def __init__(self, models, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+        """
+        Args:
+            models: Models with a `predict_prepared_batch` method.
+            max_workers (int): Maximum members run at once, and so outputs
+                held at once.
+        """
+        if max_workers < 1:
+            raise ValueError(f"Invalid max_workers={max_workers}, must be at least 1.")
+
+        self.models = list(models)
+        self.max_workers = min(max_workers, max(len(self.models), 1))
+
+        self._pool = None
+        if len(self.models) > 1 and self.max_workers > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="ensemble"
+            )
+
+    def run(self, batch_input, reducer) -> None:
+        """
+        Predict `batch_input` with every model and add the outputs to
+        `reducer` in model order.
+        """
+        if self._pool is None:
+            for model in self.models:
+                reducer.add(model.predict_prepared_batch(batch_input))
+            return
+
+        # Set once each member has added its output, or failed
+        added = [threading.Event() for _ in self.models]
+
+        # The pool starts members in submission order, so the member each one
+        # waits for is always already running or done
+        futures = [
+            self._pool.submit(
+                self._predict_and_add,
+                model,
+                batch_input,
+                reducer,
+                added[i - 1] if i else None,
+                added[i],
+            )
+            for i, model in enumerate(self.models)
+        ]
+        for future in futures:
+            # Re-raise errors from the members
+            future.result()
+
+    @staticmethod
+    def _predict_and_add(model, batch_input, reducer, previous_added, added) -> None:
+        try:
+            # The output goes out of scope once added, so futures don't keep it
+            preds = model.predict_prepared_batch(batch_input)
+            if previous_added is not None:
+                previous_added.wait()
+            reducer.add(preds)
+        finally:
+            added.set()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __enter__(self) -> "EnsembleExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,150 @@
+from typing import Optional
+
+import numpy as np
+
+
+class EnsembleReducer:
+    """
+    Reduce the predictions of an ensemble of models for one batch of tiles
+    to per-pixel class indices.
+
+    Model outputs are summed into a single running-sum buffer covering only
+    the center crop of each tile, which is the only part written to the
+    output. The buffer is allocated once and reused for every batch, so peak
+    memory does not grow with the number of models in the ensemble.
+
+    Usage, per batch:
+        reducer.reset()
+        for model in models:
+            reducer.add(model.predict_batch(batch_imgs))
+        classes = reducer.argmax()
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        tile_size: int = 256,
+        crop_amount: int = 64,
+        num_classes: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            batch_size (int): Maximum number of tiles in a batch.
+            tile_size (int): Height and width of the model output tiles.
+            crop_amount (int): Pixels discarded on each side of a tile.
+            num_classes (int, optional): Number of output classes. Taken from
+                the first model output if not given.
+        """
+        if 2 * crop_amount >= tile_size:
+            raise ValueError(
+                f"Invalid crop size={crop_amount} for tile size={tile_size}."
+            )
+
+        self.batch_size = batch_size
+        self.tile_size = tile_size
+        self.crop_amount = crop_amount
+        self.crop_size = tile_size - 2 * crop_amount
+
+        self._crop = slice(crop_amount, crop_amount + self.crop_size)
+        self._sum = None
+        self._classes = None
+        self._num_tiles = 0
+        self._num_members = 0
+
+        if num_classes is not None:
+            self._allocate(num_classes)
+
+    @property
+    def num_members(self) -> int:
+        """
+        Number of model outputs added since the last reset.
+        """
+        return self._num_members
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the reusable buffers in bytes.
+        """
+        if self._sum is None:
+            return 0
+        return self._sum.nbytes + self._classes.nbytes
+
+    def _allocate(self, num_classes: int) -> None:
+        if num_classes > 256:
+            raise ValueError(
+                f"Too many classes={num_classes} for uint8 class indices."
+            )
+
+        shape = (self.batch_size, self.crop_size, self.crop_size)
+        self._sum = np.zeros(shape + (num_classes,), dtype=np.float32)
+        self._classes = np.zeros(shape, dtype=np.uint8)
+
+    def reset(self) -> None:
+        """
+        Start reducing a new batch.
+        """
+        self._num_tiles = 0
+        self._num_members = 0
+
+    def add(self, preds: np.ndarray) -> None:
+        """
+        Add the output of one model for the current batch.
+
+        Args:
+            preds (np.ndarray): Model output of shape (B, H, W, C)
+        """
+        num_tiles = preds.shape[0]
+
+        if preds.shape[1:3] != (self.tile_size, self.tile_size):
+            raise ValueError(
+                f"Expected predictions of size {self.tile_size}, got shape {preds.shape}."
+            )
+        if num_tiles > self.batch_size:
+            raise ValueError(
+                f"Batch of {num_tiles} tiles is larger than batch size={self.batch_size}."
+            )
+
+        if self._sum is None:
+            self._allocate(preds.shape[3])
+        elif preds.shape[3] != self._sum.shape[3]:
+            raise ValueError(
+                f"Expected {self._sum.shape[3]} classes, got shape {preds.shape}."
+            )
+
+        if self._num_members and num_tiles != self._num_tiles:
+            raise ValueError(
+                f"Expected a batch of {self._num_tiles} tiles, got {num_tiles}."
+            )
+
+        center = preds[:, self._crop, self._crop, :]
+        running_sum = self._sum[:num_tiles]
+
+        if self._num_members == 0:
+            np.copyto(running_sum, center, casting="same_kind")
+        else:
+            np.add(running_sum, center, out=running_sum, casting="same_kind")
+
+        self._num_tiles = num_tiles
+        self._num_members += 1
+
+    def argmax(self) -> np.ndarray:
+        """
+        Return the class with the highest summed score for each pixel.
+
+        The argmax of the sum is the argmax of the ensemble mean, so no
+        division is needed.
+
+        Returns:
+            np.ndarray: uint8 class indices of shape (B, crop, crop). The
+            array is a view into a buffer reused by the next batch.
+        """
+        if self._num_members == 0:
+            raise ValueError("No predictions have been added to the reducer.")
+
+        classes = self._classes[: self._num_tiles]
+        np.copyto(
+            classes, np.argmax(self._sum[: self._num_tiles], axis=3), casting="unsafe"
+        )
+
+        return classes
@@ -2,16 +2,36 @@ from dataclasses import dataclass
 from pathlib import Path
 import sys
 import time
+from types import SimpleNamespace
 
 from affine import Affine
 import numpy as np
 
 import rasterio
 from rasterio import windows
-from rasterio.vrt import WarpedVRT
 from rasterio.enums import Resampling
 
-from pre_trained_model import PreTrainedModel
+from area_statistics import ClassAreaStatistics, open_zones
+from ensemble_executor import DEFAULT_MAX_WORKERS, EnsembleExecutor
+from ensemble_reducer import EnsembleReducer
+from pre_trained_model import PreTrainedModel, normalize_tiles
+from preview import ClassPyramid
+from resolution import NativeGridResampler, model_grid_profile, resampling_for
+from scene_statistics import (
+    NORMALIZATION_MODES,
+    NORMALIZATION_SCENE,
+    NORMALIZATION_TILE,
+    scene_band_scales,
+)
+from tile_readers import (
+    MemmapRaster,
+    clip_window,
+    grid_matches,
+    iter_memmap_tiles,
+    iter_source_tiles,
+    iter_warped_tiles,
+    select_tiles,
+)
 
 # Pyinstaller compatibility
 # If running as a PyInstaller bundle, use the _MEIPASS attribute to find the base path
@@ -33,6 +53,11 @@ PRE_TRAINED_MODELS = [
     ),
 ]
 
+ENSEMBLE_MODEL_NAME = "Average (Top 3 Models)"
+
+# Class values mapped for use with the mowing n-value app
+RECLASS_MAP = {0: 5, 1: 5, 2: 5, 3: 5, 4: 5, 5: 5, 6: 3, 7: 4, 8: 3, 9: 3}
+
 
 @dataclass
 class Result:
@@ -41,9 +66,7 @@ class Result:
 
 
 def reclassify(arr):
-    reclass_map = {0: 5, 1: 5, 2: 5, 3: 5, 4: 5, 5: 5, 6: 3, 7: 4, 8: 3, 9: 3}
-
-    return np.vectorize(reclass_map.get)(arr)
+    return np.vectorize(RECLASS_MAP.get)(arr)
 
 
 def get_crop_window(window, crop_amount):
@@ -62,27 +85,119 @@ def get_crop_window(window, crop_amount):
     return windows.Window(col_off=col_off, row_off=row_off, width=width, height=height)
 
 
-def get_tiles(src, width: int = 256, height: int = 256, stride: int = 256):
+def get_tiles(
+    src,
+    width: int = 256,
+    height: int = 256,
+    stride: int = 256,
+    edge_aware: bool = False,
+    crop_amount: int = 64,
+):
+    """
+    Yield (window, transform) for the tiles of `src`.
+
+    By default windows start at the raster origin and are clipped to the
+    raster, so the outer `crop_amount` pixels are never covered by a center
+    crop and partial windows along the edges are not predicted.
+
+    With `edge_aware`, windows start `crop_amount` pixels before the raster
+    origin and continue until their center crops reach the far edges. These
+    windows are not clipped: the tile readers reflect pad the part outside
+    the raster.
+    """
     ncols, nrows = src.meta["width"], src.meta["height"]
 
-    window_offsets = [
-        (col, row)
-        for col in range(0, ncols, stride)
-        for row in range(0, nrows - 128, stride)
-    ]
+    if edge_aware:
+        col_offsets = range(-crop_amount, ncols - crop_amount, stride)
+        row_offsets = range(-crop_amount, nrows - crop_amount, stride)
+    else:
+        # Skip windows starting in the last overlap, which are always partial
+        col_offsets = range(0, ncols - max(width - stride, 0), stride)
+        row_offsets = range(0, nrows - max(height - stride, 0), stride)
+
+    window_offsets = [(col, row) for col in col_offsets for row in row_offsets]
 
     overall_window = windows.Window(col_off=0, row_off=0, height=nrows, width=ncols)
 
     for col_off, row_off in window_offsets:
         window = windows.Window(
             col_off=col_off, row_off=row_off, width=width, height=height
-        ).intersection(overall_window)
+        )
+        if not edge_aware:
+            window = window.intersection(overall_window)
 
         transform = windows.transform(window, src.transform)
 
         yield window, transform
 
 
+def estimate_valid_windows(
+    src,
+    tile_size: int = 256,
+    stride: int = 128,
+    edge_aware: bool = False,
+    profile=None,
+):
+    """
+    Return the windows of `src` that contain at least one non-nodata pixel.
+
+    With `edge_aware`, windows extend past the raster edges so the whole
+    raster is predicted; see `get_tiles`.
+
+    If `profile` describes another grid, e.g. from `model_grid_profile`,
+    the windows are on that grid. That grid is scanned with the chunked
+    warper, which reads each source pixel once instead of once per
+    overlapping window.
+    """
+    if profile is not None and not grid_matches(src, profile):
+        grid = SimpleNamespace(meta=profile, transform=profile["transform"])
+        candidates = [
+            window
+            for window, _ in get_tiles(
+                grid, tile_size, tile_size, stride, edge_aware=edge_aware
+            )
+        ]
+
+        valid = set()
+        for window, tile_img in iter_warped_tiles(src, profile, candidates, indexes=(1,)):
+            if not np.all(tile_img == profile["nodata"]):
+                valid.add(window.flatten())
+
+        # The warper yields windows chunk by chunk; keep the scan order
+        return [window for window in candidates if window.flatten() in valid]
+
+    profile = src.profile.copy()
+
+    valid_windows = []
+
+    for window, _ in get_tiles(src, tile_size, tile_size, stride, edge_aware=edge_aware):
+        tile_img = src.read(1, window=clip_window(window, src.width, src.height))
+
+        if np.all(tile_img == profile["nodata"]):
+            continue
+
+        valid_windows.append(window)
+
+    return valid_windows
+
+
+def select_models(models, selection: str = ENSEMBLE_MODEL_NAME):
+    """
+    Return the models matching a model selection.
+
+    `selection` is either ENSEMBLE_MODEL_NAME, for all models, or the
+    trial name of a single model.
+    """
+    if selection == ENSEMBLE_MODEL_NAME:
+        return list(models)
+
+    selected = [m for m in models if m.trial_name == selection]
+    if not selected:
+        raise ValueError(f"Selected model '{selection}' not found.")
+
+    return selected
+
+
 def generate_prediction(
     src,
     profile,
@@ -94,31 +209,175 @@ def generate_prediction(
     batch_size: int = 4,
     progress_callback=None,
     reclassify_values: bool = False,
+    area_statistics=None,
+    class_pyramid=None,
+    tile_store=None,
+    edge_aware: bool = False,
+    resampling: Resampling = Resampling.nearest,
+    output_profile=None,
+    band_scales=None,
+    ensemble_workers: int = DEFAULT_MAX_WORKERS,
 ):
+    """
+    Predict `windows` of `src` with the ensemble of `models` and write the
+    class map to `out_prediction_tif`.
+
+    Each batch is normalized once and up to `ensemble_workers` models run
+    concurrently on it, see EnsembleExecutor. Each running model holds one
+    full output, so `ensemble_workers`, not the ensemble size, bounds their
+    peak memory.
+
+    If `area_statistics` (a ClassAreaStatistics) is given, class pixel counts
+    are accumulated from each block as it is written.
+
+    If `class_pyramid` (a ClassPyramid) is given, it is updated with each
+    block as it is written, for a live preview, and written as the output's
+    internal overviews at the end.
+
+    If `tile_store` (a TileStore) is given, preprocessed batches are streamed
+    from it instead of being read from `src`; `src` and `windows` are then
+    not used, and `profile` defaults to the store's georeferencing.
+
+    Windows may extend past the raster edges, e.g. from
+    `estimate_valid_windows(..., edge_aware=True)`; their tiles are reflect
+    padded and their crops are clipped to the raster when written. With
+    `edge_aware`, the last batch is also padded to `batch_size` by repeating
+    its last tile, so the models always see the same batch shape.
+
+    `profile` is the grid the models predict on. When it differs from the
+    grid of `src`, tiles are warped onto it with `resampling`, chunk by
+    chunk. If `output_profile` is given, e.g. the input's native grid, each
+    block is mapped onto it by nearest neighbour as it is written, and
+    `area_statistics` and `class_pyramid` see the blocks on that grid.
+
+    If `band_scales` are given, e.g. from `scene_band_scales`, every tile is
+    normalized with the same per-band multipliers instead of its own band
+    maxima. Tiles from a `tile_store` are already normalized.
+    """
+    if tile_store is not None and profile is None:
+        profile = tile_store.profile
+
+    native_grid = None
+    if output_profile is not None and (
+        (output_profile["width"], output_profile["height"])
+        != (profile["width"], profile["height"])
+        or not output_profile["transform"].almost_equals(profile["transform"])
+    ):
+        native_grid = NativeGridResampler(profile["transform"], output_profile)
+    else:
+        output_profile = profile
 
-    cell_height = cell_width = tile_size
     tif_profile = {
         "driver": "GTiff",
         "count": 1,
-        "height": profile["height"],
-        "width": profile["width"],
+        "height": output_profile["height"],
+        "width": output_profile["width"],
         "dtype": "uint8",
-        "crs": src.profile["crs"],
-        "transform": profile["transform"],
+        "crs": output_profile["crs"],
+        "transform": output_profile["transform"],
         "nodata": 255,
     }
 
-    with rasterio.open(out_prediction_tif, "w", **tif_profile) as tile_dst:
-        with WarpedVRT(src, **profile) as vrt:
-            batch_imgs = []
-            batch_windows = []
-
-            for window in windows:
-                if window.height != cell_height or window.width != cell_width:
-                    continue
-
-                tile_img = vrt.read((1, 2, 3, 4), window=window)
-
+    # Only the center of each tile is written, so only the center is reduced
+    reducer = EnsembleReducer(batch_size, tile_size=tile_size, crop_amount=64)
+
+    with EnsembleExecutor(models, max_workers=ensemble_workers) as executor, rasterio.open(
+        out_prediction_tif, "w", **tif_profile
+    ) as tile_dst:
+        if class_pyramid is not None:
+            class_pyramid.prepare_overviews(tile_dst)
+
+        batch_imgs = []
+        batch_windows = []
+
+        def write_block(window, classes):
+            if area_statistics is not None:
+                area_statistics.add(window, classes)
+
+            if reclassify_values:
+                classes = reclassify(classes)
+
+            tile_dst.write(classes, window=window, indexes=1)
+
+            if class_pyramid is not None:
+                class_pyramid.update(window, classes)
+
+        def flush_batch(prepared_batch):
+            missing = batch_size - len(batch_windows)
+            if edge_aware and missing > 0:
+                prepared_batch = np.concatenate(
+                    [prepared_batch, np.repeat(prepared_batch[-1:], missing, axis=0)]
+                )
+
+            # Every model gets the same normalized batch, concurrently
+            reducer.reset()
+            executor.run(prepared_batch, reducer)
+
+            batch_classes = reducer.argmax()
+
+            # Padding tiles have no window, so zip stops before their classes
+            for window, pred_crop in zip(batch_windows, batch_classes):
+                crop_window = get_crop_window(window, crop_amount=64)
+
+                # Crops of border windows can extend past the far edges
+                write_window = clip_window(crop_window, profile["width"], profile["height"])
+                if write_window != crop_window:
+                    row = int(write_window.row_off - crop_window.row_off)
+                    col = int(write_window.col_off - crop_window.col_off)
+                    pred_crop = pred_crop[
+                        row : row + int(write_window.height),
+                        col : col + int(write_window.width),
+                    ]
+                    crop_window = write_window
+
+                if native_grid is not None:
+                    native_block = native_grid.resample(crop_window, pred_crop)
+                    if native_block is not None:
+                        write_block(*native_block)
+                else:
+                    write_block(crop_window, pred_crop)
+
+                if progress_callback:
+                    progress_callback()
+
+            batch_imgs.clear()
+            batch_windows.clear()
+
+        if tile_store is not None:
+            for store_windows, store_batch in tile_store.iter_batches(batch_size):
+                batch_windows.extend(store_windows)
+                flush_batch(store_batch)
+        else:
+            # Only full size tiles are predicted
+            tile_windows = select_tiles(windows, tile_size)
+
+            # Uncompressed, pixel-interleaved sources are memory mapped and
+            # their tiles go straight into preprocessing in HWC order
+            memmap_raster = None
+            if grid_matches(src, profile):
+                memmap_raster = MemmapRaster.open(src)
+
+            if memmap_raster is not None:
+                tiles = iter_memmap_tiles(memmap_raster, tile_windows)
+            else:
+                # Read directly from the source when its grid matches the
+                # target grid, otherwise warp once per chunk instead of once
+                # per tile
+                tiles = iter_source_tiles(
+                    src, profile, tile_windows, resampling=resampling
+                )
+
+            def flush_tiles():
+                # Normalize once for the whole ensemble
+                flush_batch(
+                    normalize_tiles(
+                        batch_imgs,
+                        channels_last=memmap_raster is not None,
+                        scales=band_scales,
+                    )
+                )
+
+            for window, tile_img in tiles:
                 if np.average(tile_img) == profile["nodata"]:
                     continue
 
@@ -126,46 +385,116 @@ def generate_prediction(
                 batch_windows.append(window)
 
                 if len(batch_imgs) == batch_size:
-                    batch_preds = []
-                    for model in models:
-                        preds = model.predict_batch(batch_imgs)
-                        batch_preds.append(preds)
-
-                    avg_preds = np.mean(batch_preds, axis=0)
-                    batch_argmax = np.argmax(avg_preds, axis=3)
-
-                    for i in range(batch_size):
-                        crop_window = get_crop_window(batch_windows[i], crop_amount=64)
-                        pred_crop = batch_argmax[i][64:192, 64:192]
-
-                        if reclassify_values:
-                            pred_crop = reclassify(pred_crop)
-
-                        tile_dst.write(pred_crop, window=crop_window, indexes=1)
-
-                        if progress_callback:
-                            progress_callback()
-
-                    batch_imgs.clear()
-                    batch_windows.clear()
+                    flush_tiles()
 
             if batch_imgs:
-                batch_preds = []
-                for model in models:
-                    preds = model.predict_batch(batch_imgs)
-                    batch_preds.append(preds)
-
-                avg_preds = np.mean(batch_preds, axis=0)
-                batch_argmax = np.argmax(avg_preds, axis=3)
+                flush_tiles()
 
-                for i in range(len(batch_imgs)):
-                    crop_window = get_crop_window(batch_windows[i], crop_amount=64)
-                    pred_crop = batch_argmax[i][64:192, 64:192]
+    if class_pyramid is not None:
+        class_pyramid.write_overviews(out_prediction_tif)
 
-                    if reclassify_values:
-                        pred_crop = reclassify(pred_crop)
 
-                    tile_dst.write(pred_crop, window=crop_window, indexes=1)
-
-                    if progress_callback:
-                        progress_callback()
+def predict_raster(
+    input_path,
+    output_path,
+    models,
+    batch_size: int = 4,
+    reclassify_values: bool = True,
+    statistics_path=None,
+    zones_path=None,
+    zone_field=None,
+    edge_aware: bool = False,
+    native_output: bool = False,
+    normalization: str = NORMALIZATION_TILE,
+    ensemble_workers: int = DEFAULT_MAX_WORKERS,
+    start_callback=None,
+    progress_callback=None,
+) -> int:
+    """
+    Predict the raster at `input_path` with the ensemble of `models` and
+    write the class map to `output_path`, as the GUI and the prediction
+    service do.
+
+    Inputs at other resolutions are predicted on the model's grid, and the
+    class map is written on that grid, or on the input's own grid with
+    `native_output`. A ClassPyramid is always built and written as the
+    output's overviews. With `statistics_path`, class areas are written to
+    it, per zone of the zone raster or polygon layer `zones_path` if given.
+
+    Args:
+        normalization (str): NORMALIZATION_TILE or NORMALIZATION_SCENE.
+        start_callback: Called with (total_tiles, class_pyramid) once the
+            tiles are counted and before prediction starts, e.g. to show a
+            live preview of the pyramid.
+        progress_callback: Called once per predicted tile.
+
+    Returns:
+        int: Number of candidate tiles.
+    """
+    if normalization not in NORMALIZATION_MODES:
+        raise ValueError(f"Unknown normalization '{normalization}'.")
+
+    zones = None
+
+    try:
+        with rasterio.open(input_path) as src:
+            profile = model_grid_profile(src)
+
+            valid_windows = estimate_valid_windows(
+                src, edge_aware=edge_aware, profile=profile
+            )
+
+            output_profile = profile
+            if native_output:
+                output_profile = src.profile.copy()
+
+            class_pyramid = ClassPyramid(
+                output_profile["width"], output_profile["height"]
+            )
+
+            if start_callback is not None:
+                start_callback(len(valid_windows), class_pyramid)
+
+            band_scales = None
+            if normalization == NORMALIZATION_SCENE:
+                band_scales = scene_band_scales(src)
+
+            area_statistics = None
+            if statistics_path:
+                if zones_path:
+                    zones = open_zones(zones_path, output_profile, zone_field)
+                area_statistics = ClassAreaStatistics(
+                    output_profile["transform"],
+                    output_profile["crs"],
+                    zones=zones,
+                    reclass_map=RECLASS_MAP,
+                )
+
+            generate_prediction(
+                src,
+                profile,
+                output_path,
+                models,
+                valid_windows,
+                tile_size=256,
+                stride=128,
+                batch_size=batch_size,
+                progress_callback=progress_callback,
+                reclassify_values=reclassify_values,
+                area_statistics=area_statistics,
+                class_pyramid=class_pyramid,
+                edge_aware=edge_aware,
+                resampling=resampling_for(src),
+                output_profile=output_profile,
+                band_scales=band_scales,
+                ensemble_workers=ensemble_workers,
+            )
+
+        if area_statistics is not None:
+            area_statistics.write(statistics_path)
+
+    finally:
+        if zones is not None:
+            zones.close()
+
+    return len(valid_windows)
@@ -4,6 +4,7 @@ __author__ = "Kahlil Amin"
 __email__ = "kaamin@rivco.org"
 __build_date__ = "2025-06-30"
 
+import argparse
 import os
 import sys
 import time
@@ -15,15 +16,26 @@ from pathlib import Path
 import webbrowser
 
 import numpy as np
-import tensorflow as tf
 
 import rasterio
 
+from area_statistics import statistics_path_for
+from ensemble_executor import DEFAULT_MAX_WORKERS, configure_threads
 from generate_prediction import (
-    generate_prediction,
-    get_tiles,
+    ENSEMBLE_MODEL_NAME,
+    predict_raster,
+    select_models,
     PRE_TRAINED_MODELS,
 )
+from prediction_service import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    PredictionServiceClient,
+)
+from preview import class_map_to_ppm
+from quick_look import generate_quick_look, get_quick_look_tiles, quick_look_profile
+from resolution import MAX_RESOLUTION, MIN_RESOLUTION
+from scene_statistics import NORMALIZATION_SCENE, NORMALIZATION_TILE
 
 # If running as a PyInstaller EXE, include GDAL_PATH, PROJ_LIB environment variables
 # and redirect stdout/stderr to log files.
@@ -46,18 +58,36 @@ if getattr(sys, "frozen", False):
 
 
 class PredictionApp:
-    def __init__(self, master):
+    def __init__(
+        self, master, service_client=None, ensemble_workers=DEFAULT_MAX_WORKERS
+    ):
         self.master = master
         master.title(f"Vegetation Prediction App v{__version__}")
 
         self.pre_trained_models = PRE_TRAINED_MODELS
 
+        # When set, jobs are submitted to a local prediction service
+        # instead of running in this process
+        self.service_client = service_client
+
+        # Models of the ensemble run at the same time in this process
+        self.ensemble_workers = ensemble_workers
+
         self.prediction_thread = None
 
+        # Decimated class map of the running prediction, shown as a preview
+        self.class_pyramid = None
+        self.preview_image = None
+
         self.input_file = tk.StringVar()
         self.output_file = tk.StringVar()
         self.batch_size = tk.IntVar(value=4)
         self.reclassify_values = tk.BooleanVar(value=True)  # New checkbox variable
+        self.write_statistics = tk.BooleanVar(value=False)
+        self.quick_look = tk.BooleanVar(value=False)
+        self.edge_aware = tk.BooleanVar(value=True)
+        self.native_output = tk.BooleanVar(value=False)
+        self.scene_normalization = tk.BooleanVar(value=False)
 
         # Input File
         tk.Label(master, text="Input Raster File:").grid(row=0, column=0, sticky="e")
@@ -83,6 +113,11 @@ class PredictionApp:
         input_frame.columnconfigure(0, weight=1)
         input_frame.columnconfigure(1, weight=1)
         input_frame.columnconfigure(2, weight=1)
+        input_frame.columnconfigure(3, weight=1)
+        input_frame.columnconfigure(4, weight=1)
+        input_frame.columnconfigure(5, weight=1)
+        input_frame.columnconfigure(6, weight=1)
+        input_frame.columnconfigure(7, weight=1)
 
         # Batch Size section
         batch_frame = tk.Frame(input_frame)
@@ -97,9 +132,9 @@ class PredictionApp:
         model_frame.grid(row=0, column=1, sticky="ew")
 
         self.model_selection = tk.StringVar()
-        self.model_selection.set("Average (Top 3 Models)")
+        self.model_selection.set(ENSEMBLE_MODEL_NAME)
 
-        model_options = ["Average (Top 3 Models)"] + [
+        model_options = [ENSEMBLE_MODEL_NAME] + [
             model.trial_name for model in self.pre_trained_models
         ]
 
@@ -119,6 +154,51 @@ class PredictionApp:
             reclass_frame, text="Reclassify Values", variable=self.reclassify_values
         ).pack(side="left")
 
+        # Area Statistics Checkbox section
+        statistics_frame = tk.Frame(input_frame)
+        statistics_frame.grid(row=0, column=3, sticky="ew")
+        tk.Checkbutton(
+            statistics_frame,
+            text="Write Area Statistics",
+            variable=self.write_statistics,
+        ).pack(side="left")
+
+        # Quick Look Checkbox section
+        quick_look_frame = tk.Frame(input_frame)
+        quick_look_frame.grid(row=0, column=4, sticky="ew")
+        tk.Checkbutton(
+            quick_look_frame,
+            text="Quick Look (4x Coarser)",
+            variable=self.quick_look,
+        ).pack(side="left")
+
+        # Edge Coverage Checkbox section
+        edge_frame = tk.Frame(input_frame)
+        edge_frame.grid(row=0, column=5, sticky="ew")
+        tk.Checkbutton(
+            edge_frame,
+            text="Predict Raster Edges",
+            variable=self.edge_aware,
+        ).pack(side="left")
+
+        # Native Resolution Output Checkbox section
+        native_output_frame = tk.Frame(input_frame)
+        native_output_frame.grid(row=0, column=6, sticky="ew")
+        tk.Checkbutton(
+            native_output_frame,
+            text="Write at Input Resolution",
+            variable=self.native_output,
+        ).pack(side="left")
+
+        # Scene Normalization Checkbox section
+        normalization_frame = tk.Frame(input_frame)
+        normalization_frame.grid(row=0, column=7, sticky="ew")
+        tk.Checkbutton(
+            normalization_frame,
+            text="Scene Normalization",
+            variable=self.scene_normalization,
+        ).pack(side="left")
+
         # Progress Bar (moved to row 4)
         self.progress = ttk.Progressbar(
             master, orient="horizontal", length=400, mode="determinate"
@@ -143,6 +223,11 @@ class PredictionApp:
         self.status_label = tk.Label(master, text="Ready")
         self.status_label.grid(row=5, column=0, columnspan=3)
 
+        # Live preview of the prediction
+        self.preview_label = tk.Label(master)
+        self.preview_label.grid(row=6, column=0, columnspan=3, pady=5)
+        self.update_preview_visibility()
+
         # Close window
         master.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -174,6 +259,9 @@ class PredictionApp:
         self.master.update_idletasks()
 
     def show_about(self):
+        # TensorFlow is only imported once models are loaded
+        import tensorflow as tf
+
         about_win = tk.Toplevel(self.master)
         about_win.title("About")
         about_win.resizable(False, False)
@@ -240,20 +328,18 @@ class PredictionApp:
                     )
                     return False
 
-                # Check resolution (pixel size)
+                # Check resolution (pixel size). Inputs that are not at the
+                # model's resolution are resampled on the fly
                 xres, yres = src.res
-                expected_res = 0.5  # feet
-
-                # Allow slight tolerance
-                tolerance = expected_res * 0.01  # 1% tolerance
 
                 if not (
-                    abs(xres - expected_res) < tolerance
-                    and abs(yres - expected_res) < tolerance
+                    MIN_RESOLUTION <= xres <= MAX_RESOLUTION
+                    and MIN_RESOLUTION <= yres <= MAX_RESOLUTION
                 ):
                     messagebox.showerror(
                         "Invalid Input",
-                        f"Input raster resolution must be {expected_res} feet.\n"
+                        f"Input raster resolution must be between {MIN_RESOLUTION} "
+                        f"and {MAX_RESOLUTION} feet.\n"
                         f"Found: ({xres:.4f}, {yres:.4f})",
                     )
                     return False
@@ -264,22 +350,6 @@ class PredictionApp:
             messagebox.showerror("Invalid Input", f"Failed to read input raster:\n{e}")
             return False
 
-    def estimate_valid_windows(self, src, tile_size=256, stride=128):
-
-        profile = src.profile.copy()
-
-        valid_windows = []
-
-        for window, _ in get_tiles(src, tile_size, tile_size, stride):
-            tile_img = src.read(1, window=window)
-
-            if np.all(tile_img == profile["nodata"]):
-                continue
-
-            valid_windows.append(window)
-
-        return valid_windows
-
     def run_prediction(self):
         # Validate input and output paths
         if not self.input_file.get():
@@ -290,6 +360,8 @@ class PredictionApp:
             messagebox.showerror("Error", "Please specify an output prediction file.")
             return
 
+        self.update_preview_visibility()
+
         def task():
             try:
                 start_time = time.time()
@@ -305,20 +377,21 @@ class PredictionApp:
 
                 # Load models
                 selected = self.model_selection.get()
-                if selected == "Average (Top 3 Models)":
-                    models_to_use = self.pre_trained_models
-                else:
-                    models_to_use = [
-                        m for m in self.pre_trained_models if m.trial_name == selected
-                    ]
-                    if not models_to_use:
-                        messagebox.showerror(
-                            "Error", f"Selected model '{selected}' not found."
-                        )
-                        return
-
-                for model in models_to_use:
-                    model.load()
+                try:
+                    models_to_use = select_models(self.pre_trained_models, selected)
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e))
+                    return
+
+                # A quick look uses the selected model, or the first one of
+                # the ensemble
+                if self.quick_look.get():
+                    models_to_use = models_to_use[:1]
+
+                # The prediction service keeps its own models loaded
+                if self.service_client is None or self.quick_look.get():
+                    for model in models_to_use:
+                        model.load()
 
                 # Start reading file
                 self.master.after(
@@ -337,51 +410,17 @@ class PredictionApp:
                 if not self.validate_input_raster(sar_img_tif):
                     return  # Abort if invalid
 
-                with rasterio.open(sar_img_tif) as src:
-
-                    valid_windows = self.estimate_valid_windows(src)
-                    total_tiles = len(valid_windows)
-
-                    # Switch to determinate mode
-                    self.master.after(
-                        0,
-                        lambda: [
-                            self.progress.stop(),
-                            self.progress.config(
-                                mode="determinate", maximum=total_tiles, value=0
-                            ),
-                            self.update_status("Processing..."),
-                        ],
+                if self.quick_look.get():
+                    total_tiles = self.run_quick_look(
+                        sar_img_tif, prediction_tif, models_to_use[0]
                     )
-
-                    processed_tiles = 0
-
-                    def progress_callback():
-                        nonlocal processed_tiles
-                        processed_tiles += 1
-                        self.master.after(
-                            0,
-                            lambda: [
-                                self.progress.config(value=processed_tiles),
-                                self.update_status(
-                                    f"Processing... {processed_tiles}/{total_tiles} ({processed_tiles/total_tiles:.2%})"
-                                ),
-                            ],
-                        )
-
-                    profile = src.profile.copy()
-
-                    generate_prediction(
-                        src,
-                        profile,
-                        prediction_tif,
-                        models_to_use,
-                        valid_windows,
-                        tile_size=256,
-                        stride=128,
-                        batch_size=self.batch_size.get(),
-                        progress_callback=progress_callback,
-                        reclassify_values=self.reclassify_values.get(),
+                elif self.service_client is not None:
+                    total_tiles = self.run_prediction_on_service(
+                        sar_img_tif, prediction_tif, selected
+                    )
+                else:
+                    total_tiles = self.run_prediction_in_process(
+                        sar_img_tif, prediction_tif, models_to_use
                     )
 
                 elapsed_time = time.time() - start_time
@@ -413,8 +452,194 @@ class PredictionApp:
         self.prediction_thread = threading.Thread(target=task)
         self.prediction_thread.start()
 
+    def update_preview_visibility(self):
+        # Clear the previous run's preview; quick looks build no class
+        # pyramid, so have nothing to show
+        self.class_pyramid = None
+        self.preview_image = None
+        self.preview_label.config(image="")
+
+        if self.quick_look.get():
+            self.preview_label.grid_remove()
+        else:
+            self.preview_label.grid()
+
+    def show_preview(self, ppm_data):
+        self.preview_image = tk.PhotoImage(data=ppm_data, format="PPM")
+        self.preview_label.config(image=self.preview_image)
+
+    def refresh_preview(self):
+        if self.class_pyramid is None:
+            return
+
+        self.show_preview(class_map_to_ppm(self.class_pyramid.preview()))
+
+        # Keep refreshing until the prediction finishes
+        if self.prediction_thread is not None and self.prediction_thread.is_alive():
+            self.master.after(1000, self.refresh_preview)
+
+    def start_progress(self, total_tiles):
+        self.master.after(
+            0,
+            lambda: [
+                self.progress.stop(),
+                self.progress.config(mode="determinate", maximum=total_tiles, value=0),
+                self.update_status("Processing..."),
+            ],
+        )
+
+    def report_progress(self, processed_tiles, total_tiles):
+        self.master.after(
+            0,
+            lambda: [
+                self.progress.config(value=processed_tiles),
+                self.update_status(
+                    f"Processing... {processed_tiles}/{total_tiles} ({processed_tiles/total_tiles:.2%})"
+                ),
+            ],
+        )
+
+    def run_prediction_in_process(self, sar_img_tif, prediction_tif, models_to_use):
+        total_tiles = 0
+        processed_tiles = 0
+
+        def start_callback(num_tiles, class_pyramid):
+            nonlocal total_tiles
+            total_tiles = num_tiles
+
+            # Switch to determinate mode
+            self.start_progress(total_tiles)
+            if self.scene_normalization.get():
+                self.master.after(
+                    0, lambda: self.update_status("Computing scene statistics...")
+                )
+
+            self.class_pyramid = class_pyramid
+            self.master.after(0, self.refresh_preview)
+
+        def progress_callback():
+            nonlocal processed_tiles
+            processed_tiles += 1
+            self.report_progress(processed_tiles, total_tiles)
+
+        return predict_raster(
+            sar_img_tif,
+            prediction_tif,
+            models_to_use,
+            batch_size=self.batch_size.get(),
+            reclassify_values=self.reclassify_values.get(),
+            statistics_path=(
+                statistics_path_for(prediction_tif)
+                if self.write_statistics.get()
+                else None
+            ),
+            edge_aware=self.edge_aware.get(),
+            native_output=self.native_output.get(),
+            normalization=(
+                NORMALIZATION_SCENE
+                if self.scene_normalization.get()
+                else NORMALIZATION_TILE
+            ),
+            ensemble_workers=self.ensemble_workers,
+            start_callback=start_callback,
+            progress_callback=progress_callback,
+        )
+
+    def run_quick_look(self, sar_img_tif, prediction_tif, model):
+        with rasterio.open(sar_img_tif) as src:
+            profile = quick_look_profile(src)
+            total_tiles = len(get_quick_look_tiles(profile["width"], profile["height"]))
+
+            self.start_progress(total_tiles)
+
+            processed_tiles = 0
+
+            def progress_callback():
+                nonlocal processed_tiles
+                processed_tiles += 1
+                self.report_progress(processed_tiles, total_tiles)
+
+            generate_quick_look(
+                src,
+                prediction_tif,
+                model,
+                batch_size=self.batch_size.get(),
+                progress_callback=progress_callback,
+                reclassify_values=self.reclassify_values.get(),
+            )
+
+        return total_tiles
+
+    def run_prediction_on_service(
+        self, sar_img_tif, prediction_tif, selected, poll_interval=0.5
+    ):
+        job = self.service_client.submit(
+            input_path=str(sar_img_tif),
+            output_path=str(prediction_tif),
+            model=selected,
+            batch_size=self.batch_size.get(),
+            reclassify_values=self.reclassify_values.get(),
+            statistics_path=(
+                str(statistics_path_for(prediction_tif))
+                if self.write_statistics.get()
+                else None
+            ),
+            edge_aware=self.edge_aware.get(),
+            native_output=self.native_output.get(),
+            normalization=(
+                NORMALIZATION_SCENE
+                if self.scene_normalization.get()
+                else NORMALIZATION_TILE
+            ),
+        )
+
+        self.master.after(0, lambda: self.update_status("Queued on service..."))
+
+        progress_started = False
+        while job["status"] not in (JOB_COMPLETED, JOB_FAILED):
+            time.sleep(poll_interval)
+            job = self.service_client.get_job(job["job_id"])
+
+            if job["total_tiles"]:
+                if not progress_started:
+                    self.start_progress(job["total_tiles"])
+                    progress_started = True
+                self.report_progress(job["processed_tiles"], job["total_tiles"])
+
+            # The service builds the class pyramid, so fetch its preview
+            preview = self.service_client.get_preview(job["job_id"])
+            if preview is not None:
+                self.master.after(0, lambda preview=preview: self.show_preview(preview))
+
+        if job["status"] == JOB_FAILED:
+            raise RuntimeError(job["error"])
+
+        return job["total_tiles"]
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__app_name__)
+    parser.add_argument(
+        "--service-url",
+        help="Submit predictions to a running prediction service, e.g. http://127.0.0.1:8765",
+    )
+    parser.add_argument(
+        "--ensemble-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of models to run at the same time. "
+        "Each holds one batch of outputs in memory.",
+    )
+    args = parser.parse_args()
+
+    service_client = None
+    if args.service_url:
+        service_client = PredictionServiceClient(args.service_url)
+    else:
+        configure_threads(min(args.ensemble_workers, len(PRE_TRAINED_MODELS)))
+
     root = tk.Tk()
-    app = PredictionApp(root)
+    app = PredictionApp(
+        root, service_client=service_client, ensemble_workers=args.ensemble_workers
+    )
     root.mainloop()
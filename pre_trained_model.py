@@ -1,9 +1,63 @@
 import numpy as np
-import tensorflow as tf
-from typing import Union, Optional
+from typing import TYPE_CHECKING, Union, Optional
 from pathlib import Path
 
-tf.get_logger().setLevel("ERROR")
+if TYPE_CHECKING:
+    import tensorflow as tf
+
+
+def normalize_tiles(imgs, channels_last: bool = False, scales=None) -> np.ndarray:
+    """
+    Normalize a batch of tiles to the 8-bit model input, in one pass.
+
+    By default gives the same values as `PreTrainedModel.prepare_tile` on
+    integer rasters: each band of each tile is scaled by its own max to
+    [0, 255] and truncated to an integer.
+
+    If per-band `scales` are given, e.g. from scene statistics, every tile
+    is scaled by them instead with a single multiply, clipped to 255.
+
+    Args:
+        imgs: Batch of integer image tiles with shape (B, 4, 256, 256), or
+            (B, 256, 256, 4) if `channels_last`
+        channels_last (bool): Whether bands are the last axis of `imgs`.
+        scales: Optional per-band multipliers, one per band.
+
+    Returns:
+        np.ndarray: uint8 batch of shape (B, 256, 256, 4)
+    """
+    imgs = np.asarray(imgs)
+
+    if scales is not None:
+        shape = (1, 1, 1, -1) if channels_last else (1, -1, 1, 1)
+        scaled = np.multiply(
+            imgs, np.asarray(scales, dtype=np.float32).reshape(shape), dtype=np.float32
+        )
+        np.minimum(scaled, 255.0, out=scaled)
+        normalized = scaled.astype(np.uint8)
+
+        return normalized if channels_last else normalized.transpose(0, 2, 3, 1)
+
+    if channels_last:
+        # Reducing one band at a time is much faster than reducing over
+        # the strided spatial axes of an HWC array
+        band_max = np.stack(
+            [imgs[..., i].max(axis=(1, 2)) for i in range(imgs.shape[3])], axis=-1
+        )[:, None, None, :]
+    else:
+        band_max = imgs.max(axis=(2, 3), keepdims=True)
+
+    # Bands that are all zero stay zero
+    band_max = np.where(band_max == 0, 1, band_max)
+
+    scaled = np.multiply(imgs, 255.0)
+    np.divide(scaled, band_max, out=scaled)
+    normalized = scaled.astype(np.float16).astype(np.uint8)
+
+    if channels_last:
+        return normalized
+
+    return normalized.transpose(0, 2, 3, 1)
 
 
 class PreTrainedModel:
@@ -33,10 +87,15 @@ class PreTrainedModel:
 
     def load(self) -> None:
         if self._model is None:
+            # Imported on first load, so the GUI and the service client can
+            # start without TensorFlow
+            import tensorflow as tf
+
+            tf.get_logger().setLevel("ERROR")
             self._model = tf.keras.models.load_model(self.model_path, compile=False)
 
     @property
-    def model(self) -> Optional[tf.keras.Model]:
+    def model(self) -> Optional["tf.keras.Model"]:
         """
         Load and return the TensorFlow model.
 
@@ -70,6 +129,8 @@ class PreTrainedModel:
         rgbi = np.expand_dims(img, axis=0)
 
         # Re-arrange dimensions to 1x256x256x4. TF needs input in batches
+        import tensorflow as tf
+
         tf_rgbi = tf.transpose(rgbi, perm=[0, 2, 3, 1])
 
         # Note: segmentation-models seresnet does not require preprocessing
@@ -117,3 +178,16 @@ class PreTrainedModel:
         """
         batch_input = self.prepare_tile_batch(imgs)
         return self.model.predict(batch_input)
+
+    def predict_prepared_batch(self, batch_input: np.ndarray) -> np.ndarray:
+        """
+        Run model inference on a batch that is already preprocessed, e.g. by
+        `normalize_tiles` or read from a TileStore.
+
+        Args:
+            batch_input: Batch of shape (B, 256, 256, 4)
+
+        Returns:
+            Model predictions for the entire batch
+        """
+        return self.model.predict(batch_input)
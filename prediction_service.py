@@ -0,0 +1,524 @@
+"""
+Local prediction service.
+
+Keeps the pre-trained models loaded in a long-running process and runs
+prediction jobs submitted over HTTP on localhost, so GUI sessions and
+scripts on the same workstation don't each pay for TensorFlow startup and
+model loading, and share a single concurrency limit.
+
+Run with:
+    python prediction_service.py --port 8765 --max-jobs 1
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import ipaddress
+import json
+import threading
+import time
+from typing import Optional
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from ensemble_executor import DEFAULT_MAX_WORKERS, configure_threads
+from generate_prediction import (
+    ENSEMBLE_MODEL_NAME,
+    predict_raster,
+    select_models,
+    PRE_TRAINED_MODELS,
+)
+from preview import class_map_to_ppm
+from scene_statistics import NORMALIZATION_MODES, NORMALIZATION_TILE
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class PredictionJob:
+    input_path: str
+    output_path: str
+    model: str = ENSEMBLE_MODEL_NAME
+    batch_size: int = 4
+    reclassify_values: bool = True
+    statistics_path: Optional[str] = None
+    zones_path: Optional[str] = None
+    zone_field: Optional[str] = None
+    edge_aware: bool = False
+    native_output: bool = False
+    normalization: str = NORMALIZATION_TILE
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JOB_QUEUED
+    processed_tiles: int = 0
+    total_tiles: int = 0
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    # Options a client is allowed to set when submitting a job
+    OPTIONS = (
+        "input_path",
+        "output_path",
+        "model",
+        "batch_size",
+        "reclassify_values",
+        "statistics_path",
+        "zones_path",
+        "zone_field",
+        "edge_aware",
+        "native_output",
+        "normalization",
+    )
+
+    # Options that are switched on or off; JSON booleans or 0 and 1
+    FLAGS = ("reclassify_values", "edge_aware", "native_output")
+
+    @classmethod
+    def from_request(cls, request: dict) -> "PredictionJob":
+        """
+        Build a job from a submitted request, rejecting unknown options.
+        """
+        unknown = set(request) - set(cls.OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+
+        for key in ("input_path", "output_path"):
+            if not request.get(key):
+                raise ValueError(f"Missing required job option '{key}'.")
+
+        for key in cls.FLAGS:
+            # A string such as "false" would otherwise switch the option on
+            value = request.get(key, False)
+            if not isinstance(value, int) or value not in (0, 1):
+                raise ValueError(f"Invalid {key}={value!r}, must be true or false.")
+
+        job = cls(**request)
+        for key in cls.FLAGS:
+            setattr(job, key, bool(getattr(job, key)))
+
+        if int(job.batch_size) < 1:
+            raise ValueError(f"Invalid batch size={job.batch_size}.")
+        if job.normalization not in NORMALIZATION_MODES:
+            raise ValueError(f"Invalid normalization '{job.normalization}'.")
+
+        return job
+
+    @property
+    def progress(self) -> float:
+        if not self.total_tiles:
+            return 0.0
+        return self.processed_tiles / self.total_tiles
+
+    def to_dict(self) -> dict:
+        job = asdict(self)
+        job["progress"] = self.progress
+        return job
+
+
+class PredictionService:
+    """
+    Runs prediction jobs against a set of pre-loaded models.
+
+    Jobs are queued and run through `generate_prediction`, at most
+    `max_concurrent_jobs` at a time, each running up to `ensemble_workers`
+    of its models at once.
+    """
+
+    def __init__(
+        self,
+        models=None,
+        max_concurrent_jobs: int = 1,
+        ensemble_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> None:
+        if max_concurrent_jobs < 1:
+            raise ValueError(f"Invalid max_concurrent_jobs={max_concurrent_jobs}.")
+        if ensemble_workers < 1:
+            raise ValueError(f"Invalid ensemble_workers={ensemble_workers}.")
+
+        self.models = list(PRE_TRAINED_MODELS if models is None else models)
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.ensemble_workers = ensemble_workers
+
+        self._jobs = {}
+        # Class pyramids of running jobs, and the last preview of finished ones
+        self._pyramids = {}
+        self._previews = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs)
+
+    def load_models(self) -> None:
+        for model in self.models:
+            model.load()
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "models": [m.trial_name for m in self.models],
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "ensemble_workers": self.ensemble_workers,
+        }
+
+    def submit(self, request: dict) -> PredictionJob:
+        job = PredictionJob.from_request(request)
+
+        # Fail fast on a bad model selection instead of when the job starts
+        select_models(self.models, job.model)
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+        self._executor.submit(self._run_job, job)
+
+        return job
+
+    def get_job(self, job_id: str) -> Optional[PredictionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get_preview(self, job_id: str):
+        """
+        Return the decimated class map of a job's prediction so far, or None
+        if the job hasn't started predicting.
+        """
+        with self._lock:
+            class_pyramid = self._pyramids.get(job_id)
+            if class_pyramid is None:
+                return self._previews.get(job_id)
+
+        return class_pyramid.preview()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _run_job(self, job: PredictionJob) -> None:
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+
+        def start_callback(total_tiles, class_pyramid):
+            job.total_tiles = total_tiles
+            with self._lock:
+                self._pyramids[job.job_id] = class_pyramid
+
+        def progress_callback():
+            job.processed_tiles += 1
+
+        try:
+            models = select_models(self.models, job.model)
+            for model in models:
+                model.load()
+
+            predict_raster(
+                job.input_path,
+                job.output_path,
+                models,
+                batch_size=int(job.batch_size),
+                reclassify_values=job.reclassify_values,
+                statistics_path=job.statistics_path,
+                zones_path=job.zones_path,
+                zone_field=job.zone_field,
+                edge_aware=job.edge_aware,
+                native_output=job.native_output,
+                normalization=job.normalization,
+                ensemble_workers=self.ensemble_workers,
+                start_callback=start_callback,
+                progress_callback=progress_callback,
+            )
+
+            # Windows skipped by generate_prediction never report progress
+            job.processed_tiles = job.total_tiles
+            job.status = JOB_COMPLETED
+
+        except Exception as e:
+            job.error = str(e)
+            job.status = JOB_FAILED
+
+        finally:
+            # Keep only the small preview of a finished job, not its pyramid
+            with self._lock:
+                class_pyramid = self._pyramids.pop(job.job_id, None)
+                if class_pyramid is not None:
+                    self._previews[job.job_id] = class_pyramid.preview().copy()
+            job.finished_at = time.time()
+
+
+def is_loopback_host(host: str) -> bool:
+    """
+    Return True if `host`, a host name with an optional port, names this
+    machine's loopback interface.
+    """
+    try:
+        hostname = urllib.parse.urlsplit(f"//{host}").hostname
+    except ValueError:
+        return False
+
+    if hostname is None:
+        return False
+    if hostname == "localhost":
+        return True
+
+    try:
+        return ipaddress.ip_address(hostname).is_loopback
+    except ValueError:
+        return False
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API for a PredictionService:
+
+    - GET /health: service status
+    - GET /jobs: all jobs
+    - GET /jobs/<job_id>: one job
+    - GET /jobs/<job_id>/preview: the job's class map so far, as a PPM image
+    - POST /jobs: submit a job, body is a JSON object of job options
+
+    Jobs write to any path the service can, so requests from web pages are
+    refused: the Host header, and the Origin header when a browser sends
+    one, must name the loopback interface, which defeats DNS rebinding, and
+    jobs must be posted as application/json, which browsers can't send
+    cross-origin without a preflight this server doesn't answer.
+    """
+
+    @property
+    def service(self) -> PredictionService:
+        return self.server.service
+
+    def check_origin(self) -> bool:
+        """
+        Send a 403 and return False unless the request comes from this
+        machine rather than a web page.
+        """
+        host = self.headers.get("Host", "")
+        origin = self.headers.get("Origin")
+
+        allowed = is_loopback_host(host)
+        if allowed and origin is not None:
+            parts = urllib.parse.urlsplit(origin)
+            allowed = parts.scheme in ("http", "https") and is_loopback_host(
+                parts.netloc
+            )
+
+        if not allowed:
+            self.send_json(403, {"error": "Requests must come from localhost."})
+        return allowed
+
+    def send_json(self, status: int, body) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_preview(self, job_id: str) -> None:
+        classes = self.service.get_preview(job_id)
+        if classes is None:
+            self.send_json(404, {"error": f"No preview for job '{job_id}'."})
+            return
+
+        data = class_map_to_ppm(classes)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/x-portable-pixmap")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if not self.check_origin():
+            return
+
+        parts = self.path.strip("/").split("/")
+
+        if parts == ["health"]:
+            self.send_json(200, self.service.health())
+        elif parts == ["jobs"]:
+            self.send_json(200, [job.to_dict() for job in self.service.list_jobs()])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.service.get_job(parts[1])
+            if job is None:
+                self.send_json(404, {"error": f"Unknown job '{parts[1]}'."})
+            else:
+                self.send_json(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "preview":
+            self.send_preview(parts[1])
+        else:
+            self.send_json(404, {"error": f"Unknown path '{self.path}'."})
+
+    def do_POST(self):
+        if not self.check_origin():
+            return
+
+        if self.path.strip("/") != "jobs":
+            self.send_json(404, {"error": f"Unknown path '{self.path}'."})
+            return
+
+        if self.headers.get_content_type() != "application/json":
+            self.send_json(415, {"error": "Job requests must be application/json."})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Job request must be a JSON object.")
+            job = self.service.submit(request)
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        self.send_json(201, job.to_dict())
+
+    def log_message(self, format, *args):
+        # Keep the console quiet while clients poll job status
+        pass
+
+
+def make_server(
+    service: PredictionService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), PredictionRequestHandler)
+    server.service = service
+    return server
+
+
+class PredictionServiceError(RuntimeError):
+    pass
+
+
+class PredictionServiceClient:
+    """
+    Client for a PredictionService running behind `make_server`.
+    """
+
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}") -> None:
+        self.url = url.rstrip("/")
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None):
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.url}{path}",
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())["error"]
+            except (ValueError, KeyError):
+                message = str(e)
+            raise PredictionServiceError(message) from None
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+    def submit(self, **options) -> dict:
+        return self._request("POST", "/jobs", options)
+
+    def get_job(self, job_id: str) -> dict:
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def get_preview(self, job_id: str) -> Optional[bytes]:
+        """
+        Return the job's class map so far as a PPM image, or None if there
+        is none yet.
+        """
+        try:
+            with urllib.request.urlopen(f"{self.url}/jobs/{job_id}/preview") as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise PredictionServiceError(str(e)) from None
+
+
+class LocalPredictionClient:
+    """
+    In-process stand-in for PredictionServiceClient, with the same interface.
+    """
+
+    def __init__(self, service: PredictionService) -> None:
+        self.service = service
+
+    def health(self) -> dict:
+        return self.service.health()
+
+    def submit(self, **options) -> dict:
+        try:
+            return self.service.submit(options).to_dict()
+        except (ValueError, TypeError) as e:
+            raise PredictionServiceError(str(e)) from None
+
+    def get_job(self, job_id: str) -> dict:
+        job = self.service.get_job(job_id)
+        if job is None:
+            raise PredictionServiceError(f"Unknown job '{job_id}'.")
+        return job.to_dict()
+
+    def get_preview(self, job_id: str) -> Optional[bytes]:
+        classes = self.service.get_preview(job_id)
+        return None if classes is None else class_map_to_ppm(classes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local prediction service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--max-jobs",
+        type=int,
+        default=1,
+        help="Maximum number of prediction jobs to run at the same time.",
+    )
+    parser.add_argument(
+        "--ensemble-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of models of a job to run at the same time. "
+        "Each holds one batch of outputs in memory.",
+    )
+    args = parser.parse_args()
+
+    service = PredictionService(
+        max_concurrent_jobs=args.max_jobs, ensemble_workers=args.ensemble_workers
+    )
+
+    # Let the running models of every concurrent job run at the same time
+    configure_threads(
+        min(args.ensemble_workers, len(service.models)) * args.max_jobs
+    )
+
+    print("Loading models...")
+    service.load_models()
+
+    server = make_server(service, args.host, args.port)
+    print(f"Prediction service listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
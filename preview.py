@@ -0,0 +1,146 @@
+"""
+Decimated class map kept in memory while the prediction is written.
+
+The pyramid serves as a live preview of a running job and, at the end of the
+run, is written as the output's internal GeoTIFF overviews, so no separate
+overview pass over the full resolution output is needed.
+"""
+
+import math
+
+import numpy as np
+
+import rasterio
+from rasterio import windows
+from rasterio.enums import Resampling
+
+# RGB colors for the class values, other values are drawn in gray
+CLASS_COLORS = {
+    0: (230, 25, 75),
+    1: (60, 180, 75),
+    2: (255, 225, 25),
+    3: (0, 130, 200),
+    4: (245, 130, 48),
+    5: (145, 30, 180),
+    6: (70, 240, 240),
+    7: (240, 50, 230),
+    8: (210, 245, 60),
+    9: (0, 128, 128),
+    255: (255, 255, 255),
+}
+
+
+def default_overview_factors(width: int, height: int, min_size: int = 256) -> list:
+    """
+    Return overview factors from 4, doubling until the overview fits in
+    `min_size` pixels.
+
+    Factor 2 is left out to keep the in-memory pyramid to about 1/12 of the
+    full resolution output.
+    """
+    factors = [4]
+    while max(width, height) / factors[-1] > min_size:
+        factors.append(factors[-1] * 2)
+    return factors
+
+
+class ClassPyramid:
+    """
+    Nearest-neighbour decimated copies of a class map at several factors,
+    updated block by block as the class map is written.
+    """
+
+    def __init__(self, width: int, height: int, factors=None, nodata: int = 255):
+        self.width = width
+        self.height = height
+        self.factors = list(factors or default_overview_factors(width, height))
+        self.nodata = nodata
+
+        # Overview sizes are rounded up, as GDAL does
+        self.levels = [
+            np.full(
+                (math.ceil(height / factor), math.ceil(width / factor)),
+                nodata,
+                dtype=np.uint8,
+            )
+            for factor in self.factors
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self.levels)
+
+    def update(self, window: windows.Window, classes: np.ndarray) -> None:
+        """
+        Update every level with a block of the class map written at `window`.
+        """
+        row_off, col_off = int(window.row_off), int(window.col_off)
+
+        for factor, level in zip(self.factors, self.levels):
+            # Sample the source pixel nearest each overview pixel center
+            center = factor // 2
+            row_start = (center - row_off) % factor
+            col_start = (center - col_off) % factor
+
+            sampled = classes[row_start::factor, col_start::factor]
+            if sampled.size == 0:
+                continue
+
+            level_row = (row_off + row_start) // factor
+            level_col = (col_off + col_start) // factor
+            level[
+                level_row : level_row + sampled.shape[0],
+                level_col : level_col + sampled.shape[1],
+            ] = sampled
+
+    def preview(self, max_size: int = 300) -> np.ndarray:
+        """
+        Return the finest level that fits in `max_size` pixels, further
+        decimated if even the coarsest level is too large.
+        """
+        for level in self.levels:
+            if max(level.shape) <= max_size:
+                return level
+
+        level = self.levels[-1]
+        step = math.ceil(max(level.shape) / max_size)
+        return level[::step, ::step]
+
+    def prepare_overviews(self, dst) -> None:
+        """
+        Create empty overviews in a newly created output dataset.
+
+        Must be called before any data is written, so GDAL has nothing to
+        resample.
+        """
+        dst.build_overviews(self.factors, Resampling.nearest)
+
+    def write_overviews(self, path) -> None:
+        """
+        Write the pyramid levels into the overviews created by
+        `prepare_overviews`, after the output dataset has been closed.
+        """
+        for overview_level, level in enumerate(self.levels):
+            with rasterio.open(path, "r+", overview_level=overview_level) as ovr:
+                if ovr.shape != level.shape:
+                    raise ValueError(
+                        f"Overview {overview_level} has shape {ovr.shape}, "
+                        f"expected {level.shape}."
+                    )
+                ovr.write(level, 1)
+
+
+def class_map_to_ppm(classes: np.ndarray) -> bytes:
+    """
+    Encode a class map as a binary PPM image, which Tk can display without
+    any imaging library.
+    """
+    palette = np.full((256, 3), 128, dtype=np.uint8)
+    for value, color in CLASS_COLORS.items():
+        palette[value] = color
+
+    rgb = palette[classes]
+    height, width = classes.shape
+    header = f"P6 {width} {height} 255\n".encode("ascii")
+
+    return header + rgb.tobytes()
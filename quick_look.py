@@ -0,0 +1,154 @@
+"""
+Quick-look prediction at reduced resolution.
+
+Produces a coarse vegetation map of a whole mosaic in a fraction of the time
+of a full run: tiles are read decimated (from overviews when the input has
+them), predicted by a single model with non-overlapping windows and no
+center cropping, and written to a coarse georeferenced class map.
+"""
+
+import math
+from pathlib import Path
+
+from affine import Affine
+import numpy as np
+
+import rasterio
+from rasterio import windows
+from rasterio.enums import Resampling
+
+from ensemble_reducer import EnsembleReducer
+from generate_prediction import reclassify
+from pre_trained_model import normalize_tiles
+
+DEFAULT_SCALE = 4
+
+
+def quick_look_profile(src, scale: int = DEFAULT_SCALE) -> dict:
+    """
+    Return the profile of the coarse output grid, `scale` times coarser than
+    the input grid.
+    """
+    return {
+        "driver": "GTiff",
+        "count": 1,
+        "width": math.ceil(src.width / scale),
+        "height": math.ceil(src.height / scale),
+        "dtype": "uint8",
+        "crs": src.crs,
+        "transform": src.transform * Affine.scale(scale),
+        "nodata": 255,
+    }
+
+
+def get_quick_look_tiles(width: int, height: int, tile_size: int = 256):
+    """
+    Return non-overlapping windows covering the coarse grid, including
+    partial windows along the right and bottom edges.
+    """
+    overall_window = windows.Window(col_off=0, row_off=0, width=width, height=height)
+
+    return [
+        windows.Window(col_off=col, row_off=row, width=tile_size, height=tile_size).intersection(
+            overall_window
+        )
+        for col in range(0, width, tile_size)
+        for row in range(0, height, tile_size)
+    ]
+
+
+def read_decimated_tile(
+    src,
+    window: windows.Window,
+    scale: int,
+    tile_size: int = 256,
+    resampling: Resampling = Resampling.nearest,
+) -> np.ndarray:
+    """
+    Read the source area under a coarse window, decimated to the coarse
+    grid and zero padded to a full (4, tile_size, tile_size) tile.
+
+    GDAL reads from the input's overviews when a suitable one exists.
+    """
+    src_window = windows.Window(
+        col_off=window.col_off * scale,
+        row_off=window.row_off * scale,
+        width=window.width * scale,
+        height=window.height * scale,
+    ).intersection(windows.Window(0, 0, src.width, src.height))
+
+    tile_img = np.zeros((4, tile_size, tile_size), dtype=src.dtypes[0])
+    tile_img[:, : int(window.height), : int(window.width)] = src.read(
+        (1, 2, 3, 4),
+        window=src_window,
+        out_shape=(4, int(window.height), int(window.width)),
+        resampling=resampling,
+    )
+
+    return tile_img
+
+
+def generate_quick_look(
+    src,
+    out_quick_look_tif: Path,
+    model,
+    scale: int = DEFAULT_SCALE,
+    tile_size: int = 256,
+    batch_size: int = 4,
+    progress_callback=None,
+    reclassify_values: bool = False,
+    resampling: Resampling = Resampling.nearest,
+):
+    """
+    Predict a coarse class map of `src` with a single `model`.
+
+    Args:
+        scale (int): Output pixel size as a multiple of the input pixel size.
+        resampling: Resampling used when decimating the input.
+    """
+    profile = quick_look_profile(src, scale)
+    nodata = src.profile["nodata"]
+
+    # A reducer with no crop turns one model's output into uint8 classes
+    reducer = EnsembleReducer(batch_size, tile_size=tile_size, crop_amount=0)
+
+    with rasterio.open(out_quick_look_tif, "w", **profile) as dst:
+        batch_imgs = []
+        batch_windows = []
+
+        def flush_batch():
+            reducer.reset()
+            reducer.add(model.predict_prepared_batch(normalize_tiles(batch_imgs)))
+
+            for window, pred in zip(batch_windows, reducer.argmax()):
+                pred = pred[: int(window.height), : int(window.width)]
+
+                if reclassify_values:
+                    pred = reclassify(pred)
+
+                dst.write(pred, window=window, indexes=1)
+
+            if progress_callback:
+                for _ in batch_windows:
+                    progress_callback()
+
+            batch_imgs.clear()
+            batch_windows.clear()
+
+        for window in get_quick_look_tiles(profile["width"], profile["height"], tile_size):
+            tile_img = read_decimated_tile(src, window, scale, tile_size, resampling)
+
+            valid = tile_img[:, : int(window.height), : int(window.width)]
+            if np.average(valid) == nodata:
+                if progress_callback:
+                    progress_callback()
+                continue
+
+            batch_imgs.append(tile_img)
+            batch_windows.append(window)
+
+            if len(batch_imgs) == batch_size:
+                flush_batch()
+
+        if batch_imgs:
+            flush_batch()
@@ -0,0 +1,141 @@
+"""
+Prediction of inputs whose pixel size differs from the model's.
+
+The models were trained on 0.5 ft imagery. Inputs at other resolutions are
+predicted on a 0.5 ft grid covering the same extent: tiles are resampled on
+the fly, chunk by chunk, by the warped tile reader, so no resampled copy of
+the input is written. The class map can be mapped back onto the input's
+native grid block by block as it is written.
+"""
+
+import math
+
+from affine import Affine
+import numpy as np
+
+from rasterio import windows
+from rasterio.enums import Resampling
+
+# Pixel size of the imagery the models were trained on, in feet
+MODEL_RESOLUTION = 0.5
+
+# Range of input pixel sizes accepted for resampling, in feet
+MIN_RESOLUTION = 0.1
+MAX_RESOLUTION = 2.0
+
+
+def matches_model_resolution(res, target_res: float = MODEL_RESOLUTION) -> bool:
+    """
+    Return whether an (xres, yres) pixel size is within 1% of `target_res`.
+    """
+    tolerance = target_res * 0.01
+    return all(abs(r - target_res) < tolerance for r in res)
+
+
+def model_grid_profile(src, target_res: float = MODEL_RESOLUTION) -> dict:
+    """
+    Return the profile of the grid the models predict `src` on.
+
+    Inputs already at `target_res` are predicted on their own grid. Other
+    inputs are predicted on a north-up `target_res` grid with the same
+    origin, covering the input's extent.
+    """
+    profile = src.profile.copy()
+
+    if matches_model_resolution(src.res, target_res):
+        return profile
+
+    left, bottom, right, top = src.bounds
+    profile.update(
+        width=max(1, math.ceil(round((right - left) / target_res, 6))),
+        height=max(1, math.ceil(round((top - bottom) / target_res, 6))),
+        transform=Affine(target_res, 0.0, left, 0.0, -target_res, top),
+    )
+    return profile
+
+
+def resampling_for(src, target_res: float = MODEL_RESOLUTION) -> Resampling:
+    """
+    Return the resampling used to bring `src` to `target_res`: averaging
+    when reducing finer inputs, bilinear when enlarging coarser ones.
+    """
+    if max(src.res) < target_res:
+        return Resampling.average
+    return Resampling.bilinear
+
+
+class NativeGridResampler:
+    """
+    Maps blocks of the class map predicted on the model grid onto the
+    input's native grid by nearest neighbour, one block at a time.
+
+    Each native pixel takes the class of the model pixel containing its
+    center, so blocks that tile the model grid map to blocks that tile the
+    native grid, and the output is written in a single pass.
+    """
+
+    def __init__(self, model_transform, native_profile) -> None:
+        """
+        Args:
+            model_transform: Affine transform of the model grid.
+            native_profile: Profile of the native grid, in the same CRS as
+                the model grid and also north-up.
+        """
+        self.model_transform = model_transform
+        self.native_transform = native_profile["transform"]
+        self.native_width = native_profile["width"]
+        self.native_height = native_profile["height"]
+
+    @staticmethod
+    def _axis(start, stop, model_res, native_offset, native_res, size):
+        """
+        Return the native pixels whose centers fall in model pixels
+        [start, stop) along one axis, and the model pixel under each.
+
+        Distances are measured from the model grid origin; `native_offset`
+        is the distance of the native grid origin.
+        """
+        first = max(0, math.ceil((start * model_res - native_offset) / native_res - 0.5))
+        last = min(size, math.ceil((stop * model_res - native_offset) / native_res - 0.5))
+
+        centers = native_offset + (np.arange(first, last) + 0.5) * native_res
+        model_index = np.floor(centers / model_res).astype(np.int64)
+
+        return first, last, model_index
+
+    def resample(self, window: windows.Window, classes: np.ndarray):
+        """
+        Map a block of `classes` written at `window` on the model grid.
+
+        Returns:
+            (native_window, native_classes), or None if no native pixel
+            center falls inside the block.
+        """
+        mt, nt = self.model_transform, self.native_transform
+
+        row_off, col_off = int(window.row_off), int(window.col_off)
+        height, width = classes.shape
+
+        # Rows are measured down from the top edge of the model grid
+        first_row, last_row, model_rows = self._axis(
+            row_off, row_off + height, -mt.e, mt.f - nt.f, -nt.e, self.native_height
+        )
+        first_col, last_col, model_cols = self._axis(
+            col_off, col_off + width, mt.a, nt.c - mt.c, nt.a, self.native_width
+        )
+
+        if last_row <= first_row or last_col <= first_col:
+            return None
+
+        # Guard against rounding at the block edges
+        model_rows = np.clip(model_rows - row_off, 0, height - 1)
+        model_cols = np.clip(model_cols - col_off, 0, width - 1)
+
+        native_window = windows.Window(
+            col_off=first_col,
+            row_off=first_row,
+            width=last_col - first_col,
+            height=last_row - first_row,
+        )
+
+        return native_window, classes[np.ix_(model_rows, model_cols)]
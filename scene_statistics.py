@@ -0,0 +1,136 @@
+"""
+Scene-level band statistics for input normalization.
+
+By default each band of each tile is scaled by that tile's own max, so the
+same pixel value can reach the model differently on either side of a tile
+boundary, causing seams. Scene normalization instead scales every tile by
+per-band statistics of the whole scene, computed once from a decimated
+read (served from the input's overviews when it has them) and cached in a
+sidecar next to the input.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from rasterio.enums import Resampling
+
+from tile_readers import DEFAULT_INDEXES
+
+NORMALIZATION_TILE = "tile"
+NORMALIZATION_SCENE = "scene"
+NORMALIZATION_MODES = (NORMALIZATION_TILE, NORMALIZATION_SCENE)
+
+# Percentile mapped to 255; 100 uses the band max
+DEFAULT_PERCENTILE = 99.9
+
+
+def compute_band_statistics(
+    src,
+    percentile: float = DEFAULT_PERCENTILE,
+    max_size: int = 2048,
+    indexes=DEFAULT_INDEXES,
+) -> list:
+    """
+    Return the `percentile` of each band of `src`, ignoring nodata.
+
+    The bands are read decimated so the longer side is at most `max_size`
+    pixels; GDAL reads from overviews when a suitable one exists.
+    """
+    factor = max(1, math.ceil(max(src.width, src.height) / max_size))
+    out_shape = (
+        len(indexes),
+        math.ceil(src.height / factor),
+        math.ceil(src.width / factor),
+    )
+    data = src.read(indexes, out_shape=out_shape, resampling=Resampling.nearest)
+
+    statistics = []
+    for band in data:
+        values = band.ravel()
+        if src.nodata is not None:
+            values = values[values != src.nodata]
+
+        if values.size == 0:
+            statistics.append(0.0)
+        elif percentile >= 100:
+            statistics.append(float(values.max()))
+        else:
+            statistics.append(float(np.percentile(values, percentile)))
+
+    return statistics
+
+
+def statistics_sidecar_for(input_path) -> Path:
+    """
+    Return the band statistics sidecar path for an input raster.
+    """
+    input_path = Path(input_path)
+    return input_path.with_name(f"{input_path.stem}_band_statistics.json")
+
+
+def load_band_statistics(
+    src,
+    percentile: float = DEFAULT_PERCENTILE,
+    max_size: int = 2048,
+    sidecar: Optional[Path] = None,
+) -> list:
+    """
+    Return the band statistics of `src`, from its sidecar when the sidecar
+    was computed for the same file and settings, otherwise computing and
+    caching them.
+
+    The cache is keyed by the input's path, size and modification time. A
+    sidecar that can't be written, e.g. next to a read-only input, is
+    skipped.
+    """
+    input_path = Path(src.name)
+    sidecar = Path(sidecar) if sidecar else statistics_sidecar_for(input_path)
+
+    key = {"percentile": percentile, "max_size": max_size}
+    if input_path.is_file():
+        stat = input_path.stat()
+        key.update(
+            source=str(input_path.resolve()),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+    try:
+        with sidecar.open() as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["statistics"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    statistics = compute_band_statistics(src, percentile, max_size)
+
+    try:
+        with sidecar.open("w") as f:
+            json.dump({"key": key, "statistics": statistics}, f, indent=2)
+    except OSError:
+        pass
+
+    return statistics
+
+
+def band_scales(statistics) -> np.ndarray:
+    """
+    Return the per-band multipliers mapping each statistic to 255.
+
+    Bands with a zero statistic are left unscaled.
+    """
+    statistics = np.asarray(statistics, dtype=np.float32)
+    safe = np.where(statistics > 0, statistics, 1.0)
+    return np.where(statistics > 0, 255.0 / safe, 1.0).astype(np.float32)
+
+
+def scene_band_scales(src, percentile: float = DEFAULT_PERCENTILE) -> np.ndarray:
+    """
+    Return the cached scene normalization multipliers of `src`.
+    """
+    return band_scales(load_band_statistics(src, percentile))
@@ -0,0 +1,60 @@
+"""
+Fake ensemble member shared by the tests, standing in for PreTrainedModel
+without loading any weights.
+"""
+
+import numpy as np
+
+
+class FakeModel:
+    """
+    Predicts `winning_class` for every pixel, or for the left half of each
+    tile and `right_class` for the right half when that is given. When
+    `preds` is given it is returned for every batch instead.
+
+    Records load() calls and every batch input it predicts. With a
+    `barrier`, a prediction only returns once every member sharing the
+    barrier is predicting.
+    """
+
+    def __init__(
+        self,
+        trial_name="fake",
+        num_classes=10,
+        winning_class=6,
+        right_class=None,
+        preds=None,
+        barrier=None,
+    ):
+        self.trial_name = trial_name
+        self.num_classes = num_classes
+        self.winning_class = winning_class
+        self.right_class = right_class
+        self.preds = preds
+        self.barrier = barrier
+        self.load_calls = 0
+        self.inputs = []
+
+    @property
+    def batch_shapes(self):
+        return [batch_input.shape for batch_input in self.inputs]
+
+    def load(self):
+        self.load_calls += 1
+
+    def predict_prepared_batch(self, batch_input):
+        self.inputs.append(batch_input)
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+
+        if self.preds is not None:
+            return self.preds
+
+        preds = np.zeros(batch_input.shape[:3] + (self.num_classes,), dtype=np.float32)
+        if self.right_class is None:
+            preds[..., self.winning_class] = 1.0
+        else:
+            half = batch_input.shape[2] // 2
+            preds[:, :, :half, self.winning_class] = 1.0
+            preds[:, :, half:, self.right_class] = 1.0
+        return preds
@@ -0,0 +1,250 @@
+import csv
+import json
+import unittest
+from pathlib import Path
+import shutil
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.warp import transform_geom
+from rasterio.windows import Window
+
+from area_statistics import (
+    ClassAreaStatistics,
+    ZonePolygons,
+    ZoneRaster,
+    statistics_path_for,
+)
+from generate_prediction import (
+    RECLASS_MAP,
+    estimate_valid_windows,
+    generate_prediction,
+)
+from tests.fakes import FakeModel
+
+
+class TestClassAreaStatistics(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_area_statistics")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.transform = from_origin(0, 256, 0.5, 0.5)
+        self.crs = rasterio.crs.CRS.from_epsg(2230)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_counts_and_areas(self):
+        stats = ClassAreaStatistics(self.transform, self.crs, reclass_map=RECLASS_MAP)
+
+        classes = np.zeros((128, 128), dtype=np.uint8)
+        classes[:, 64:] = 7
+        stats.add(Window(0, 0, 128, 128), classes)
+        stats.add(Window(128, 0, 128, 128), np.full((128, 128), 6, dtype=np.uint8))
+
+        counts = stats.pixel_counts()[0]
+        self.assertEqual(counts[0], 128 * 64)
+        self.assertEqual(counts[7], 128 * 64)
+        self.assertEqual(counts[6], 128 * 128)
+
+        reclassified = stats.pixel_counts(reclassified=True)[0]
+        self.assertEqual(reclassified[5], 128 * 64)
+        self.assertEqual(reclassified[4], 128 * 64)
+        self.assertEqual(reclassified[3], 128 * 128)
+
+        # 0.5 US survey ft pixels
+        sq_ft_per_acre = 43560.0
+        self.assertAlmostEqual(stats.acres_per_pixel, 0.25 / sq_ft_per_acre, places=9)
+
+    def test_zone_raster(self):
+        zones_tif = self.tmp_dir / "zones.tif"
+        zones = np.ones((512, 512), dtype=np.uint8)
+        zones[:, 256:] = 2
+        with rasterio.open(
+            zones_tif,
+            "w",
+            driver="GTiff",
+            height=512,
+            width=512,
+            count=1,
+            dtype="uint8",
+            crs=self.crs,
+            transform=self.transform,
+        ) as dst:
+            dst.write(zones, 1)
+
+        profile = {
+            "crs": self.crs,
+            "transform": self.transform,
+            "width": 512,
+            "height": 512,
+        }
+        zone_raster = ZoneRaster(zones_tif, profile)
+        stats = ClassAreaStatistics(self.transform, self.crs, zones=zone_raster)
+        stats.add(Window(192, 0, 128, 128), np.full((128, 128), 6, dtype=np.uint8))
+        zone_raster.close()
+
+        counts = stats.pixel_counts()
+        self.assertEqual(counts[1][6], 128 * 64)
+        self.assertEqual(counts[2][6], 128 * 64)
+
+    def write_zones_geojson(self, features, crs=None):
+        collection = {"type": "FeatureCollection", "features": features}
+        if crs is not None:
+            collection["crs"] = {"type": "name", "properties": {"name": crs}}
+
+        zones_geojson = self.tmp_dir / "zones.geojson"
+        zones_geojson.write_text(json.dumps(collection))
+        return zones_geojson
+
+    def zone_polygon_counts(self, zones_geojson):
+        zone_polygons = ZonePolygons.from_file(
+            zones_geojson, "reach", self.transform, self.crs
+        )
+        stats = ClassAreaStatistics(self.transform, self.crs, zones=zone_polygons)
+        stats.add(Window(192, 0, 128, 128), np.full((128, 128), 6, dtype=np.uint8))
+        return stats
+
+    def test_zone_polygons(self):
+        # Left half of the 512x512 grid, in map coordinates
+        left_half = {
+            "type": "Polygon",
+            "coordinates": [[(0, 256), (128, 256), (128, 0), (0, 0), (0, 256)]],
+        }
+        zones_geojson = self.write_zones_geojson(
+            [
+                {
+                    "type": "Feature",
+                    "geometry": left_half,
+                    "properties": {"reach": "Reach A"},
+                }
+            ],
+            crs="EPSG:2230",
+        )
+
+        stats = self.zone_polygon_counts(zones_geojson)
+
+        counts = stats.pixel_counts()
+        self.assertEqual(counts[0][6], 128 * 64)
+        self.assertEqual(counts[1][6], 128 * 64)
+        self.assertEqual(stats.rows()[-1]["zone_name"], "Reach A")
+
+    def test_zone_polygons_grouped_by_zone_field(self):
+        # Reach A is made of two polygons, on either side of Reach B
+        def column(x0, x1):
+            return {
+                "type": "Polygon",
+                "coordinates": [[(x0, 256), (x1, 256), (x1, 0), (x0, 0), (x0, 256)]],
+            }
+
+        zones_geojson = self.write_zones_geojson(
+            [
+                {"type": "Feature", "geometry": column(x0, x1), "properties": {"reach": name}}
+                for x0, x1, name in (
+                    (96, 112, "Reach A"),
+                    (112, 128, "Reach B"),
+                    (128, 160, "Reach A"),
+                )
+            ],
+            crs="EPSG:2230",
+        )
+
+        stats = self.zone_polygon_counts(zones_geojson)
+
+        counts = stats.pixel_counts()
+        self.assertEqual(set(counts), {1, 2})
+        self.assertEqual(counts[1][6], 128 * 96)
+        self.assertEqual(counts[2][6], 128 * 32)
+        self.assertEqual(
+            sorted(row["zone_name"] for row in stats.rows()), ["Reach A", "Reach B"]
+        )
+
+    def test_zone_polygons_default_to_wgs84(self):
+        self.transform = from_origin(6200000, 2300000, 0.5, 0.5)
+        left_half = {
+            "type": "Polygon",
+            "coordinates": [
+                [
+                    (6200000, 2300000),
+                    (6200128, 2300000),
+                    (6200128, 2299744),
+                    (6200000, 2299744),
+                    (6200000, 2300000),
+                ]
+            ],
+        }
+        # RFC 7946 GeoJSON has no "crs" member and is in longitude, latitude
+        zones_geojson = self.write_zones_geojson(
+            [
+                {
+                    "type": "Feature",
+                    "geometry": transform_geom(self.crs, "EPSG:4326", left_half),
+                    "properties": {"reach": "Reach A"},
+                }
+            ]
+        )
+
+        counts = self.zone_polygon_counts(zones_geojson).pixel_counts()
+        self.assertEqual(counts[0][6], 128 * 64)
+        self.assertEqual(counts[1][6], 128 * 64)
+
+    def test_write_csv_and_json(self):
+        stats = ClassAreaStatistics(self.transform, self.crs, reclass_map=RECLASS_MAP)
+        stats.add(Window(0, 0, 128, 128), np.full((128, 128), 6, dtype=np.uint8))
+
+        csv_path = self.tmp_dir / "stats.csv"
+        stats.write(csv_path)
+        with csv_path.open() as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r["stage"] for r in rows], ["class", "reclassified"])
+        self.assertEqual([r["value"] for r in rows], ["6", "3"])
+
+        json_path = self.tmp_dir / "stats.json"
+        stats.write(json_path)
+        self.assertEqual(len(json.loads(json_path.read_text())["statistics"]), 2)
+
+        self.assertEqual(
+            statistics_path_for(Path("out") / "pred.tif"),
+            Path("out") / "pred_class_areas.csv",
+        )
+
+    def test_counts_match_written_output(self):
+        input_tif = self.tmp_dir / "input.tif"
+        output_tif = self.tmp_dir / "output.tif"
+        with rasterio.open(
+            input_tif,
+            "w",
+            driver="GTiff",
+            height=512,
+            width=512,
+            count=4,
+            dtype="uint8",
+            crs=self.crs,
+            transform=self.transform,
+            nodata=0,
+        ) as dst:
+            dst.write(np.random.randint(1, 255, (4, 512, 512)).astype(np.uint8))
+
+        with rasterio.open(input_tif) as src:
+            profile = src.profile.copy()
+            stats = ClassAreaStatistics(profile["transform"], profile["crs"])
+            generate_prediction(
+                src,
+                profile,
+                output_tif,
+                [FakeModel(right_class=8)],
+                estimate_valid_windows(src),
+                stride=128,
+                area_statistics=stats,
+            )
+
+        with rasterio.open(output_tif) as dst:
+            written = dst.read(1)
+
+        counts = stats.pixel_counts()[0]
+        expected = np.bincount(written[written != 255].ravel(), minlength=256)
+        np.testing.assert_array_equal(counts, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import gc
+import threading
+import time
+import unittest
+import weakref
+from unittest.mock import patch
+
+import numpy as np
+
+from ensemble_executor import DEFAULT_MAX_WORKERS, EnsembleExecutor, configure_threads
+from ensemble_reducer import EnsembleReducer
+from tests.fakes import FakeModel
+
+
+class SlowModel(FakeModel):
+    """
+    Returns fixed outputs after `delay` seconds and records when it finished.
+    """
+
+    def __init__(self, preds, delay, finished):
+        super().__init__(preds=preds)
+        self.delay = delay
+        self.finished = finished
+
+    def predict_prepared_batch(self, batch_input):
+        preds = super().predict_prepared_batch(batch_input)
+        time.sleep(self.delay)
+        self.finished.append(self)
+        return preds
+
+
+class TrackedOutputModel:
+    """
+    Records how many outputs of all instances are still alive whenever a
+    new output is made.
+    """
+
+    outputs = []
+    max_alive = 0
+    lock = threading.Lock()
+
+    def predict_prepared_batch(self, batch_input):
+        preds = np.ones((len(batch_input), 256, 256, 10), dtype=np.float32)
+        with self.lock:
+            gc.collect()
+            cls = TrackedOutputModel
+            cls.outputs = [ref for ref in cls.outputs if ref() is not None]
+            cls.outputs.append(weakref.ref(preds))
+            cls.max_alive = max(cls.max_alive, len(cls.outputs))
+        time.sleep(0.02)
+        return preds
+
+
+class TestEnsembleExecutor(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.batch_input = rng.integers(0, 255, (4, 256, 256, 4), dtype=np.uint8)
+        self.batch_preds = [
+            rng.random((4, 256, 256, 10), dtype=np.float32) for _ in range(3)
+        ]
+
+    def reduce(self, models, max_workers=DEFAULT_MAX_WORKERS):
+        reducer = EnsembleReducer(batch_size=4)
+        with EnsembleExecutor(models, max_workers=max_workers) as executor:
+            reducer.reset()
+            executor.run(self.batch_input, reducer)
+        return reducer
+
+    def test_members_run_concurrently_on_shared_batch(self):
+        barrier = threading.Barrier(3)
+        models = [FakeModel(preds=preds, barrier=barrier) for preds in self.batch_preds]
+
+        reducer = self.reduce(models, max_workers=3)
+
+        self.assertEqual(reducer.num_members, 3)
+        for model in models:
+            self.assertEqual(len(model.inputs), 1)
+            self.assertIs(model.inputs[0], self.batch_input)
+
+    def test_matches_sequential_reduction(self):
+        concurrent = self.reduce([FakeModel(preds=p) for p in self.batch_preds]).argmax()
+        sequential = self.reduce(
+            [FakeModel(preds=p) for p in self.batch_preds], max_workers=1
+        ).argmax()
+
+        expected = np.argmax(np.mean(self.batch_preds, axis=0), axis=3)[:, 64:192, 64:192]
+        np.testing.assert_array_equal(concurrent, expected)
+        np.testing.assert_array_equal(sequential, expected)
+
+    def test_outputs_are_added_in_model_order(self):
+        # Class 0 sums to 0 in model order but to 1 in reverse order, as
+        # float32 can't represent 1e8 + 1, so the near tie with class 1
+        # flips if the members are added in the order they finish
+        member_scores = ((1.0, 0.25), (1e8, 0.25), (-1e8, 0.25))
+        batch_preds = []
+        for scores in member_scores:
+            preds = np.zeros((4, 256, 256, 10), dtype=np.float32)
+            preds[..., :2] = scores
+            batch_preds.append(preds)
+
+        finished = []
+        models = [
+            SlowModel(preds, delay, finished)
+            for preds, delay in zip(batch_preds, (0.3, 0.15, 0.0))
+        ]
+
+        concurrent = self.reduce(models, max_workers=3).argmax()
+
+        self.assertEqual(finished, models[::-1])
+        self.assertTrue((concurrent == 1).all())
+
+    def test_outputs_are_released_as_they_are_added(self):
+        TrackedOutputModel.outputs = []
+        TrackedOutputModel.max_alive = 0
+        models = [TrackedOutputModel() for _ in range(6)]
+
+        reducer = self.reduce(models)
+
+        self.assertEqual(reducer.num_members, 6)
+        self.assertLessEqual(TrackedOutputModel.max_alive, DEFAULT_MAX_WORKERS)
+
+        with self.assertRaises(ValueError):
+            EnsembleExecutor(models, max_workers=0)
+
+    @patch("tensorflow.config.threading.set_inter_op_parallelism_threads")
+    @patch("tensorflow.config.threading.set_intra_op_parallelism_threads")
+    def test_configure_threads_keeps_intra_op_pool(self, set_intra, set_inter):
+        self.assertTrue(configure_threads(3, num_cores=12))
+        set_intra.assert_not_called()
+        set_inter.assert_called_once_with(12)
+
+        self.assertTrue(configure_threads(3, num_cores=2))
+        self.assertEqual(set_inter.call_args.args, (3,))
+
+        set_inter.side_effect = RuntimeError("already initialized")
+        self.assertFalse(configure_threads(3, num_cores=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from ensemble_reducer import EnsembleReducer
+
+
+class TestEnsembleReducer(unittest.TestCase):
+    def test_matches_mean_argmax_of_center(self):
+        rng = np.random.default_rng(0)
+        batch_preds = [
+            rng.random((4, 256, 256, 10), dtype=np.float32) for _ in range(3)
+        ]
+
+        reducer = EnsembleReducer(batch_size=4)
+        for preds in batch_preds:
+            reducer.add(preds)
+        classes = reducer.argmax()
+
+        expected = np.argmax(np.mean(batch_preds, axis=0), axis=3)[:, 64:192, 64:192]
+        self.assertEqual(classes.dtype, np.uint8)
+        self.assertEqual(classes.shape, (4, 128, 128))
+        np.testing.assert_array_equal(classes, expected)
+
+    def test_buffers_reused_across_batches(self):
+        rng = np.random.default_rng(1)
+        reducer = EnsembleReducer(batch_size=4, num_classes=10)
+        nbytes = reducer.nbytes
+
+        for num_tiles in (4, 2):
+            reducer.reset()
+            for _ in range(5):
+                reducer.add(rng.random((num_tiles, 256, 256, 10), dtype=np.float32))
+            classes = reducer.argmax()
+
+            self.assertEqual(classes.shape[0], num_tiles)
+            self.assertEqual(reducer.num_members, 5)
+            self.assertEqual(reducer.nbytes, nbytes)
+
+    def test_invalid_inputs(self):
+        reducer = EnsembleReducer(batch_size=2)
+
+        with self.assertRaises(ValueError):
+            reducer.argmax()
+
+        with self.assertRaises(ValueError):
+            reducer.add(np.zeros((3, 256, 256, 10), dtype=np.float32))
+
+        reducer.add(np.zeros((2, 256, 256, 10), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            reducer.add(np.zeros((1, 256, 256, 10), dtype=np.float32))
+
+        with self.assertRaises(ValueError):
+            EnsembleReducer(batch_size=2, tile_size=128, crop_amount=64)
+
+
+if __name__ == "__main__":
+    unittest.main()
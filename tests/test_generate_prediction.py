@@ -1,8 +1,22 @@
 import unittest
 from unittest.mock import MagicMock, patch
+from pathlib import Path
+import shutil
+
 from affine import Affine
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
 from rasterio.windows import Window
-from generate_prediction import get_crop_window, get_tiles
+from ensemble_executor import DEFAULT_MAX_WORKERS, EnsembleExecutor
+from generate_prediction import (
+    estimate_valid_windows,
+    generate_prediction,
+    get_crop_window,
+    get_tiles,
+    predict_raster,
+)
+from tests.fakes import FakeModel
 
 
 class TestGeneratePrediction(unittest.TestCase):
@@ -27,3 +41,129 @@ class TestGeneratePrediction(unittest.TestCase):
 
         tiles = list(get_tiles(mock_src, width=256, height=256, stride=256))
         self.assertGreater(len(tiles), 0)
+
+    @patch("rasterio.open")
+    def test_get_tiles_edge_aware_covers_raster(self, mock_rasterio_open):
+        mock_src = MagicMock()
+        mock_src.meta = {"width": 300, "height": 500}
+        mock_src.transform = Affine.translation(0, 0) * Affine.scale(1, -1)
+
+        tiles = list(get_tiles(mock_src, stride=128, edge_aware=True))
+
+        covered = np.zeros((500, 300), dtype=bool)
+        for window, _ in tiles:
+            self.assertEqual((window.width, window.height), (256, 256))
+            crop = get_crop_window(window, crop_amount=64)
+            covered[
+                max(int(crop.row_off), 0) : int(crop.row_off + crop.height),
+                max(int(crop.col_off), 0) : int(crop.col_off + crop.width),
+            ] = True
+        self.assertTrue(covered.all())
+
+
+class TestEdgeAwarePrediction(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_generate_prediction")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.input_tif = self.tmp_dir / "input.tif"
+
+        data = np.random.randint(1, 255, (4, 300, 330)).astype(np.uint8)
+        with rasterio.open(
+            self.input_tif,
+            "w",
+            driver="GTiff",
+            height=300,
+            width=330,
+            count=4,
+            dtype="uint8",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 0.5, 0.5),
+            nodata=0,
+        ) as dst:
+            dst.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def predict(self, edge_aware):
+        model = FakeModel()
+        output_tif = self.tmp_dir / "output.tif"
+
+        with rasterio.open(self.input_tif) as src:
+            generate_prediction(
+                src,
+                src.profile.copy(),
+                output_tif,
+                [model],
+                estimate_valid_windows(src, edge_aware=edge_aware),
+                batch_size=4,
+                edge_aware=edge_aware,
+            )
+
+        with rasterio.open(output_tif) as dst:
+            return dst.read(1), model.batch_shapes
+
+    def test_edge_aware_prediction_covers_raster(self):
+        pred, batch_shapes = self.predict(edge_aware=True)
+
+        self.assertTrue((pred == 6).all())
+        self.assertEqual(set(batch_shapes), {(4, 256, 256, 4)})
+
+    def test_default_prediction_leaves_edges_empty(self):
+        pred, _ = self.predict(edge_aware=False)
+
+        self.assertTrue((pred[:64] == 255).all())
+        self.assertTrue((pred[64:192, 64:192] == 6).all())
+
+    def test_predict_raster(self):
+        output_tif = self.tmp_dir / "output.tif"
+        statistics_csv = self.tmp_dir / "output_class_areas.csv"
+        started = []
+        progress = []
+
+        total_tiles = predict_raster(
+            self.input_tif,
+            output_tif,
+            [FakeModel()],
+            reclassify_values=False,
+            statistics_path=statistics_csv,
+            edge_aware=True,
+            start_callback=lambda *args: started.append(args),
+            progress_callback=lambda: progress.append(1),
+        )
+
+        ((started_tiles, class_pyramid),) = started
+        self.assertEqual(started_tiles, total_tiles)
+        self.assertEqual(len(progress), total_tiles)
+        self.assertIn(6, class_pyramid.preview())
+        self.assertTrue(statistics_csv.exists())
+
+        with rasterio.open(output_tif) as dst:
+            self.assertTrue((dst.read(1) == 6).all())
+
+        with self.assertRaises(ValueError):
+            predict_raster(self.input_tif, output_tif, [FakeModel()], normalization="unknown")
+
+    def test_ensemble_workers_are_bounded(self):
+        executors = []
+
+        def open_executor(*args, **kwargs):
+            executor = EnsembleExecutor(*args, **kwargs)
+            executors.append(executor)
+            return executor
+
+        models = [FakeModel() for _ in range(6)]
+        with rasterio.open(self.input_tif) as src:
+            with patch("generate_prediction.EnsembleExecutor", side_effect=open_executor):
+                generate_prediction(
+                    src,
+                    src.profile.copy(),
+                    self.tmp_dir / "output.tif",
+                    models,
+                    estimate_valid_windows(src),
+                )
+
+        # Only a few members, and so their outputs, are in flight at once
+        (executor,) = executors
+        self.assertEqual(executor.max_workers, DEFAULT_MAX_WORKERS)
+        self.assertTrue(all(model.inputs for model in models))
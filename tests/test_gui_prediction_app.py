@@ -1,11 +1,19 @@
+import subprocess
+import sys
 import unittest
 import numpy as np
 import rasterio
 from rasterio.transform import from_origin
 from pathlib import Path
+import shutil
 import tkinter as tk
+from area_statistics import statistics_path_for
+from generate_prediction import ENSEMBLE_MODEL_NAME
 from gui_prediction_app import PredictionApp
+from prediction_service import LocalPredictionClient, PredictionService
+from scene_statistics import NORMALIZATION_SCENE
 from unittest.mock import patch
+from tests.fakes import FakeModel
 
 
 class TestPredictionApp(unittest.TestCase):
@@ -100,13 +108,45 @@ class TestPredictionApp(unittest.TestCase):
             count=4,
             dtype="uint8",
             crs="EPSG:2230",
-            transform=from_origin(0, 0, 1.0, 1.0),  # invalid resolution
+            transform=from_origin(0, 0, 10.0, 10.0),  # invalid resolution
         ) as dst:
             dst.write(data)
 
         self.assertFalse(self.app.validate_input_raster(invalid_raster))
         self.mock_showerror.assert_called()
 
+    def test_validate_input_raster_valid_other_resolution(self):
+        valid_raster = self.tmp_dir / "valid_1ft.tif"
+        data = np.random.randint(0, 255, (4, 10, 10)).astype(np.uint8)
+
+        with rasterio.open(
+            valid_raster,
+            "w",
+            driver="GTiff",
+            height=10,
+            width=10,
+            count=4,
+            dtype="uint8",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 1.0, 1.0),  # resampled to 0.5 ft
+        ) as dst:
+            dst.write(data)
+
+        self.assertTrue(self.app.validate_input_raster(valid_raster))
+        self.mock_showerror.assert_not_called()
+
+    def test_preview_shown_only_for_in_process_predictions(self):
+        self.assertEqual(self.app.preview_label.winfo_manager(), "grid")
+
+        self.app.quick_look.set(True)
+        self.app.update_preview_visibility()
+        self.assertEqual(self.app.preview_label.winfo_manager(), "")
+        self.assertIsNone(self.app.class_pyramid)
+
+        self.app.quick_look.set(False)
+        self.app.update_preview_visibility()
+        self.assertEqual(self.app.preview_label.winfo_manager(), "grid")
+
     def test_validate_input_raster_invalid_bandcount(self):
         invalid_raster = self.tmp_dir / "invalid_bands.tif"
         data = np.random.randint(0, 255, (2, 10, 10)).astype(np.uint8)
@@ -128,5 +168,111 @@ class TestPredictionApp(unittest.TestCase):
         self.mock_showerror.assert_called()
 
 
+class TestPredictionAppServiceClient(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tk.Tk()
+        self.tmp_dir = Path("temp_test_gui_service")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.input_tif = self.tmp_dir / "input.tif"
+        self.output_tif = self.tmp_dir / "output.tif"
+
+        data = np.random.randint(1, 255, (4, 512, 512)).astype(np.uint8)
+        with rasterio.open(
+            self.input_tif,
+            "w",
+            driver="GTiff",
+            height=512,
+            width=512,
+            count=4,
+            dtype="uint8",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 0.5, 0.5),
+            nodata=0,
+        ) as dst:
+            dst.write(data)
+
+        self.service = PredictionService(
+            models=[FakeModel("model_1"), FakeModel("model_2")]
+        )
+        self.app = PredictionApp(
+            self.root, service_client=LocalPredictionClient(self.service)
+        )
+
+    def tearDown(self):
+        self.root.destroy()
+        self.service.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_preview_shown(self):
+        self.assertEqual(self.app.preview_label.winfo_manager(), "grid")
+
+    def test_options_are_mapped_to_job(self):
+        self.app.batch_size.set(2)
+        self.app.reclassify_values.set(False)
+        self.app.write_statistics.set(True)
+        self.app.edge_aware.set(False)
+        self.app.native_output.set(True)
+        self.app.scene_normalization.set(True)
+
+        self.app.run_prediction_on_service(
+            self.input_tif, self.output_tif, "model_2", poll_interval=0.01
+        )
+
+        (job,) = self.service.list_jobs()
+        self.assertEqual(job.input_path, str(self.input_tif))
+        self.assertEqual(job.output_path, str(self.output_tif))
+        self.assertEqual(job.model, "model_2")
+        self.assertEqual(job.batch_size, 2)
+        self.assertFalse(job.reclassify_values)
+        self.assertEqual(job.statistics_path, str(statistics_path_for(self.output_tif)))
+        self.assertFalse(job.edge_aware)
+        self.assertTrue(job.native_output)
+        self.assertEqual(job.normalization, NORMALIZATION_SCENE)
+
+    def test_progress_is_polled_until_completed(self):
+        with patch.object(
+            self.app, "start_progress", wraps=self.app.start_progress
+        ) as start_progress, patch.object(
+            self.app, "report_progress", wraps=self.app.report_progress
+        ) as report_progress:
+            total_tiles = self.app.run_prediction_on_service(
+                self.input_tif, self.output_tif, ENSEMBLE_MODEL_NAME, poll_interval=0.01
+            )
+
+        self.assertGreater(total_tiles, 0)
+        start_progress.assert_called_once_with(total_tiles)
+        self.assertEqual(report_progress.call_args.args, (total_tiles, total_tiles))
+
+        # Run the progress updates scheduled on the Tk event loop
+        self.root.update()
+        self.assertEqual(float(self.app.progress["value"]), total_tiles)
+        self.assertIn(f"{total_tiles}/{total_tiles}", self.app.status_label.cget("text"))
+        self.assertIsNotNone(self.app.preview_image)
+
+        with rasterio.open(self.output_tif) as dst:
+            self.assertTrue((dst.read(1)[64:192, 64:192] == 6).all())
+
+    def test_failed_job_raises(self):
+        with self.assertRaises(RuntimeError):
+            self.app.run_prediction_on_service(
+                self.tmp_dir / "missing.tif",
+                self.output_tif,
+                ENSEMBLE_MODEL_NAME,
+                poll_interval=0.01,
+            )
+
+
+class TestPredictionAppImports(unittest.TestCase):
+    def test_starts_without_tensorflow(self):
+        # A GUI using the prediction service never loads a model
+        code = (
+            "import sys, gui_prediction_app; "
+            "sys.exit('tensorflow' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, "-c", code])
+        self.assertEqual(result.returncode, 0)
+
+
 if __name__ == "__main__":
     unittest.main()
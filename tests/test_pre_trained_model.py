@@ -1,7 +1,7 @@
 import unittest
 import numpy as np
 from unittest.mock import patch, MagicMock
-from pre_trained_model import PreTrainedModel
+from pre_trained_model import PreTrainedModel, normalize_tiles
 
 
 class TestPreTrainedModel(unittest.TestCase):
@@ -40,3 +40,41 @@ class TestPreTrainedModel(unittest.TestCase):
 
         preds = model.predict_batch(imgs)
         self.assertEqual(preds.shape[0], 2)
+
+    @patch("tensorflow.keras.models.load_model")
+    def test_normalize_tiles_matches_prepare_tile_batch(self, mock_load_model):
+        model = PreTrainedModel("dummy_path")
+        imgs = np.random.randint(1, 4000, (2, 4, 256, 256)).astype(np.uint16)
+
+        expected = model.prepare_tile_batch([img.copy() for img in imgs])
+        normalized = normalize_tiles(imgs)
+
+        self.assertEqual(normalized.dtype, np.uint8)
+        np.testing.assert_array_equal(normalized, expected)
+
+    def test_normalize_tiles_with_scene_scales(self):
+        imgs = np.random.randint(1, 4000, (2, 4, 256, 256)).astype(np.uint16)
+        scales = np.array([255 / 1000, 255 / 2000, 255 / 3000, 255 / 4000], np.float32)
+
+        normalized = normalize_tiles(imgs, scales=scales)
+        hwc = normalize_tiles(imgs.transpose(0, 2, 3, 1), channels_last=True, scales=scales)
+
+        expected = np.minimum(
+            imgs.transpose(0, 2, 3, 1) * scales.astype(np.float32), 255
+        ).astype(np.uint8)
+        self.assertEqual(normalized.dtype, np.uint8)
+        np.testing.assert_array_equal(normalized, expected)
+        np.testing.assert_array_equal(hwc, expected)
+
+    @patch("tensorflow.keras.models.load_model")
+    def test_predict_prepared_batch(self, mock_load_model):
+        mock_model = MagicMock()
+        mock_model.predict.return_value = np.zeros((2, 256, 256, 3))
+        mock_load_model.return_value = mock_model
+
+        model = PreTrainedModel("dummy_path")
+        batch = np.zeros((2, 256, 256, 4), dtype=np.uint8)
+        preds = model.predict_prepared_batch(batch)
+
+        mock_model.predict.assert_called_once_with(batch)
+        self.assertEqual(preds.shape[0], 2)
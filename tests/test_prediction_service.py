@@ -0,0 +1,257 @@
+import http.client
+import json
+import threading
+import time
+import unittest
+from pathlib import Path
+import shutil
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from prediction_service import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    LocalPredictionClient,
+    PredictionJob,
+    PredictionService,
+    PredictionServiceClient,
+    PredictionServiceError,
+    is_loopback_host,
+    make_server,
+)
+from tests.fakes import FakeModel
+
+
+def write_test_raster(path, size=512):
+    data = np.random.randint(1, 255, (4, size, size)).astype(np.uint8)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=size,
+        width=size,
+        count=4,
+        dtype="uint8",
+        crs="EPSG:2230",
+        transform=from_origin(0, 0, 0.5, 0.5),
+        nodata=0,
+    ) as dst:
+        dst.write(data)
+
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.time() + timeout
+    job = client.get_job(job_id)
+    while job["status"] not in (JOB_COMPLETED, JOB_FAILED):
+        if time.time() > deadline:
+            raise TimeoutError(f"Job {job_id} did not finish.")
+        time.sleep(0.05)
+        job = client.get_job(job_id)
+    return job
+
+
+class TestPredictionService(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_service")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.input_tif = self.tmp_dir / "input.tif"
+        write_test_raster(self.input_tif)
+
+        self.models = [FakeModel("model_1"), FakeModel("model_2")]
+        self.service = PredictionService(models=self.models, max_concurrent_jobs=2)
+
+    def tearDown(self):
+        self.service.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_local_client_runs_job(self):
+        client = LocalPredictionClient(self.service)
+        output_tif = self.tmp_dir / "output.tif"
+
+        job = client.submit(
+            input_path=str(self.input_tif),
+            output_path=str(output_tif),
+            reclassify_values=False,
+        )
+        job = wait_for_job(client, job["job_id"])
+
+        self.assertEqual(job["status"], JOB_COMPLETED)
+        self.assertGreater(job["total_tiles"], 0)
+        self.assertEqual(job["processed_tiles"], job["total_tiles"])
+        self.assertEqual(job["progress"], 1.0)
+
+        with rasterio.open(output_tif) as dst:
+            pred = dst.read(1)
+            # Written from the class pyramid, without a separate overview pass
+            self.assertEqual(dst.overviews(1), [4])
+        self.assertEqual(pred[64:192, 64:192].tolist(), np.full((128, 128), 6).tolist())
+
+        self.assertTrue(client.get_preview(job["job_id"]).startswith(b"P6 128 128 255"))
+
+    def test_flags_are_booleans(self):
+        job = PredictionJob.from_request(
+            {
+                "input_path": "input.tif",
+                "output_path": "output.tif",
+                "reclassify_values": 0,
+                "edge_aware": True,
+            }
+        )
+
+        self.assertIs(job.reclassify_values, False)
+        self.assertIs(job.edge_aware, True)
+        self.assertIs(job.native_output, False)
+
+    def test_single_model_selection(self):
+        client = LocalPredictionClient(self.service)
+
+        job = client.submit(
+            input_path=str(self.input_tif),
+            output_path=str(self.tmp_dir / "output.tif"),
+            model="model_2",
+        )
+        wait_for_job(client, job["job_id"])
+
+        self.assertEqual(self.models[0].load_calls, 0)
+        self.assertEqual(self.models[1].load_calls, 1)
+
+    def test_invalid_requests(self):
+        client = LocalPredictionClient(self.service)
+
+        with self.assertRaises(PredictionServiceError):
+            client.submit(input_path=str(self.input_tif))
+
+        with self.assertRaises(PredictionServiceError):
+            client.submit(
+                input_path=str(self.input_tif),
+                output_path=str(self.tmp_dir / "output.tif"),
+                model="unknown",
+            )
+
+        # JSON-like strings would be truthy
+        for value in ("false", "true", None, 2):
+            with self.assertRaises(PredictionServiceError):
+                client.submit(
+                    input_path=str(self.input_tif),
+                    output_path=str(self.tmp_dir / "output.tif"),
+                    edge_aware=value,
+                )
+        self.assertEqual(self.service.list_jobs(), [])
+
+        with self.assertRaises(PredictionServiceError):
+            client.get_job("unknown")
+
+    def test_failed_job_reports_error(self):
+        client = LocalPredictionClient(self.service)
+
+        job = client.submit(
+            input_path=str(self.tmp_dir / "missing.tif"),
+            output_path=str(self.tmp_dir / "output.tif"),
+        )
+        job = wait_for_job(client, job["job_id"])
+
+        self.assertEqual(job["status"], JOB_FAILED)
+        self.assertTrue(job["error"])
+
+    def test_http_client(self):
+        server = make_server(self.service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            host, port = server.server_address
+            client = PredictionServiceClient(f"http://{host}:{port}")
+
+            self.assertEqual(client.health()["models"], ["model_1", "model_2"])
+
+            job = client.submit(
+                input_path=str(self.input_tif),
+                output_path=str(self.tmp_dir / "output.tif"),
+            )
+            job = wait_for_job(client, job["job_id"])
+            self.assertEqual(job["status"], JOB_COMPLETED)
+
+            self.assertTrue(client.get_preview(job["job_id"]).startswith(b"P6"))
+            self.assertIsNone(client.get_preview("unknown"))
+
+            with self.assertRaises(PredictionServiceError):
+                client.submit(input_path=str(self.input_tif), unknown=1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_http_rejects_requests_from_web_pages(self):
+        server = make_server(self.service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        request = {
+            "input_path": str(self.input_tif),
+            "output_path": str(self.tmp_dir / "output.tif"),
+        }
+
+        def post(headers, body=request):
+            connection = http.client.HTTPConnection(*server.server_address)
+            try:
+                connection.request("POST", "/jobs", body=json.dumps(body), headers=headers)
+                return connection.getresponse().status
+            finally:
+                connection.close()
+
+        try:
+            host, port = server.server_address
+            local = f"{host}:{port}"
+
+            # Simple cross-origin form post, no preflight
+            self.assertEqual(post({"Host": local, "Content-Type": "text/plain"}), 415)
+            # DNS rebinding
+            self.assertEqual(
+                post({"Host": "evil.example.com", "Content-Type": "application/json"}),
+                403,
+            )
+            # Cross-origin page
+            self.assertEqual(
+                post(
+                    {
+                        "Host": local,
+                        "Origin": "http://evil.example.com",
+                        "Content-Type": "application/json",
+                    }
+                ),
+                403,
+            )
+            self.assertEqual(self.service.list_jobs(), [])
+
+            self.assertEqual(
+                post(
+                    {"Host": local, "Content-Type": "application/json"},
+                    {**request, "reclassify_values": "false"},
+                ),
+                400,
+            )
+
+            self.assertEqual(
+                post(
+                    {
+                        "Host": f"localhost:{port}",
+                        "Origin": f"http://localhost:{port}",
+                        "Content-Type": "application/json; charset=utf-8",
+                    }
+                ),
+                201,
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_is_loopback_host(self):
+        for host in ("localhost", "localhost:8765", "127.0.0.1:8765", "[::1]:8765"):
+            self.assertTrue(is_loopback_host(host), host)
+        for host in ("", "evil.example.com", "192.168.1.5:8765", "localhost.evil.com"):
+            self.assertFalse(is_loopback_host(host), host)
+
+
+if __name__ == "__main__":
+    unittest.main()
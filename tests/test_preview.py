@@ -0,0 +1,80 @@
+import unittest
+from pathlib import Path
+import shutil
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from preview import ClassPyramid, class_map_to_ppm, default_overview_factors
+
+
+class TestClassPyramid(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_preview")
+        self.tmp_dir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_default_overview_factors(self):
+        self.assertEqual(default_overview_factors(1000, 800), [4])
+        self.assertEqual(default_overview_factors(40000, 30000), [4, 8, 16, 32, 64, 128, 256])
+
+    def test_update_matches_full_decimation(self):
+        classes = np.random.randint(0, 10, (600, 520)).astype(np.uint8)
+        pyramid = ClassPyramid(520, 600, factors=[4, 8])
+
+        # Blocks at offsets that are not multiples of the factors
+        for row in range(0, 600, 100):
+            for col in range(0, 520, 130):
+                pyramid.update(
+                    Window(col, row, 130, 100), classes[row : row + 100, col : col + 130]
+                )
+
+        np.testing.assert_array_equal(pyramid.levels[0], classes[2::4, 2::4])
+        np.testing.assert_array_equal(pyramid.levels[1], classes[4::8, 4::8])
+
+    def test_preview_size(self):
+        pyramid = ClassPyramid(4096, 2048, factors=[4, 8])
+        self.assertEqual(pyramid.preview(max_size=600).shape, (256, 512))
+        self.assertLessEqual(max(pyramid.preview(max_size=100).shape), 100)
+
+    def test_write_overviews(self):
+        output_tif = self.tmp_dir / "output.tif"
+        classes = np.random.randint(0, 10, (300, 260)).astype(np.uint8)
+        pyramid = ClassPyramid(260, 300, factors=[2, 4])
+
+        with rasterio.open(
+            output_tif,
+            "w",
+            driver="GTiff",
+            height=300,
+            width=260,
+            count=1,
+            dtype="uint8",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 0.5, 0.5),
+            nodata=255,
+        ) as dst:
+            pyramid.prepare_overviews(dst)
+            dst.write(classes, 1)
+            pyramid.update(Window(0, 0, 260, 300), classes)
+
+        pyramid.write_overviews(output_tif)
+
+        with rasterio.open(output_tif) as dst:
+            self.assertEqual(dst.overviews(1), [2, 4])
+            np.testing.assert_array_equal(dst.read(1), classes)
+            overview = dst.read(1, out_shape=(75, 65), resampling=Resampling.nearest)
+        np.testing.assert_array_equal(overview, pyramid.levels[1])
+
+    def test_class_map_to_ppm(self):
+        ppm = class_map_to_ppm(np.array([[0, 255]], dtype=np.uint8))
+        self.assertEqual(ppm, b"P6 2 1 255\n" + bytes([230, 25, 75, 255, 255, 255]))
+
+
+if __name__ == "__main__":
+    unittest.main()
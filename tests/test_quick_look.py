@@ -0,0 +1,73 @@
+import unittest
+from pathlib import Path
+import shutil
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from quick_look import generate_quick_look, get_quick_look_tiles, quick_look_profile
+from tests.fakes import FakeModel
+
+
+class TestQuickLook(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_quick_look")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.input_tif = self.tmp_dir / "input.tif"
+
+        with rasterio.open(
+            self.input_tif,
+            "w",
+            driver="GTiff",
+            height=1100,
+            width=1300,
+            count=4,
+            dtype="uint16",
+            crs="EPSG:2230",
+            transform=from_origin(1000, 2000, 0.5, 0.5),
+            nodata=0,
+        ) as dst:
+            dst.write(np.random.randint(1, 4000, (4, 1100, 1300)).astype(np.uint16))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_quick_look_profile_and_tiles(self):
+        with rasterio.open(self.input_tif) as src:
+            profile = quick_look_profile(src, scale=4)
+
+        self.assertEqual((profile["width"], profile["height"]), (325, 275))
+        self.assertEqual(profile["transform"], from_origin(1000, 2000, 2.0, 2.0))
+
+        tiles = get_quick_look_tiles(325, 275)
+        self.assertEqual(len(tiles), 4)
+        self.assertEqual(sum(w.width * w.height for w in tiles), 325 * 275)
+
+    def test_generate_quick_look(self):
+        output_tif = self.tmp_dir / "quick_look.tif"
+        model = FakeModel()
+        progress = []
+
+        with rasterio.open(self.input_tif) as src:
+            generate_quick_look(
+                src,
+                output_tif,
+                model,
+                scale=4,
+                batch_size=4,
+                progress_callback=lambda: progress.append(1),
+            )
+
+        with rasterio.open(output_tif) as dst:
+            self.assertEqual(dst.shape, (275, 325))
+            self.assertEqual(dst.res, (2.0, 2.0))
+            np.testing.assert_array_equal(dst.read(1), 6)
+
+        # Partial edge tiles are padded to the full tile size
+        self.assertEqual(model.batch_shapes, [(4, 256, 256, 4)])
+        self.assertEqual(len(progress), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
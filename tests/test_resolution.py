@@ -0,0 +1,159 @@
+import unittest
+from pathlib import Path
+import shutil
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+from generate_prediction import estimate_valid_windows, generate_prediction, get_tiles
+from resolution import NativeGridResampler, model_grid_profile, resampling_for
+from tile_readers import clip_window
+from tests.fakes import FakeModel
+
+
+class TestResolution(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_resolution")
+        self.tmp_dir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_raster(self, name, res, width=200, height=150):
+        path = self.tmp_dir / name
+        data = np.random.randint(1, 255, (4, height, width)).astype(np.uint8)
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=height,
+            width=width,
+            count=4,
+            dtype="uint8",
+            crs="EPSG:2230",
+            transform=from_origin(6200000, 2300000, res, res),
+            nodata=0,
+        ) as dst:
+            dst.write(data)
+        return path
+
+    def test_model_grid_profile(self):
+        for res, expected_size in ((0.5, (200, 150)), (1.0, (400, 300)), (0.25, (100, 75))):
+            with rasterio.open(self.write_raster(f"input_{res}.tif", res)) as src:
+                profile = model_grid_profile(src)
+
+                self.assertEqual((profile["width"], profile["height"]), expected_size)
+                self.assertEqual(profile["transform"].a, 0.5)
+                self.assertEqual(
+                    (profile["transform"].c, profile["transform"].f),
+                    (src.transform.c, src.transform.f),
+                )
+
+    def test_resampling_for(self):
+        with rasterio.open(self.write_raster("fine.tif", 0.25)) as src:
+            self.assertEqual(resampling_for(src), Resampling.average)
+        with rasterio.open(self.write_raster("coarse.tif", 1.0)) as src:
+            self.assertEqual(resampling_for(src), Resampling.bilinear)
+
+    def test_native_grid_resampler_is_nearest_and_complete(self):
+        rng = np.random.default_rng(0)
+        classes = rng.integers(0, 10, (256, 384)).astype(np.uint8)
+        model_transform = from_origin(0, 0, 0.5, 0.5)
+
+        for native_res in (1.0, 0.25):
+            native_profile = {
+                "transform": from_origin(0, 0, native_res, native_res),
+                "width": int(384 * 0.5 / native_res),
+                "height": int(256 * 0.5 / native_res),
+            }
+            resampler = NativeGridResampler(model_transform, native_profile)
+
+            native = np.zeros((native_profile["height"], native_profile["width"]), np.uint8)
+            written = np.zeros(native.shape, dtype=np.int64)
+
+            for row in range(0, 256, 128):
+                for col in range(0, 384, 128):
+                    window = Window(col, row, 128, 128)
+                    block = classes[row : row + 128, col : col + 128]
+                    native_window, native_classes = resampler.resample(window, block)
+
+                    rows = slice(native_window.row_off, native_window.row_off + native_window.height)
+                    cols = slice(native_window.col_off, native_window.col_off + native_window.width)
+                    native[rows, cols] = native_classes
+                    written[rows, cols] += 1
+
+            # Class of the model pixel under each native pixel center
+            centers_row = ((np.arange(native.shape[0]) + 0.5) * native_res / 0.5).astype(int)
+            centers_col = ((np.arange(native.shape[1]) + 0.5) * native_res / 0.5).astype(int)
+
+            self.assertTrue((written == 1).all())
+            np.testing.assert_array_equal(native, classes[np.ix_(centers_row, centers_col)])
+
+    def test_valid_windows_on_model_grid(self):
+        input_tif = self.write_raster("input.tif", 1.0, width=400, height=300)
+        with rasterio.open(input_tif, "r+") as dst:
+            data = dst.read()
+            data[:, :, :200] = 0  # nodata left half
+            dst.write(data)
+
+        with rasterio.open(input_tif) as src:
+            profile = model_grid_profile(src)
+
+            for edge_aware in (False, True):
+                valid_windows = estimate_valid_windows(
+                    src, edge_aware=edge_aware, profile=profile
+                )
+
+                # Reference: warp and check every window on its own
+                with WarpedVRT(
+                    src,
+                    crs=profile["crs"],
+                    transform=profile["transform"],
+                    width=profile["width"],
+                    height=profile["height"],
+                ) as vrt:
+                    expected = [
+                        window
+                        for window, _ in get_tiles(vrt, stride=128, edge_aware=edge_aware)
+                        if not np.all(
+                            vrt.read(1, window=clip_window(window, vrt.width, vrt.height)) == 0
+                        )
+                    ]
+
+                self.assertGreater(len(valid_windows), 0)
+                self.assertEqual(valid_windows, expected)
+
+    def test_prediction_on_model_grid_and_native_grid(self):
+        input_tif = self.write_raster("input.tif", 1.0)
+
+        with rasterio.open(input_tif) as src:
+            profile = model_grid_profile(src)
+            valid_windows = estimate_valid_windows(src, edge_aware=True, profile=profile)
+
+            for name, output_profile, expected_shape in (
+                ("model_grid.tif", None, (300, 400)),
+                ("native_grid.tif", src.profile.copy(), (150, 200)),
+            ):
+                generate_prediction(
+                    src,
+                    profile,
+                    self.tmp_dir / name,
+                    [FakeModel()],
+                    valid_windows,
+                    edge_aware=True,
+                    resampling=resampling_for(src),
+                    output_profile=output_profile,
+                )
+
+                with rasterio.open(self.tmp_dir / name) as dst:
+                    pred = dst.read(1)
+                    self.assertEqual(pred.shape, expected_shape)
+                    self.assertTrue((pred == 6).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
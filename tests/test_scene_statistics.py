@@ -0,0 +1,93 @@
+import os
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import shutil
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from scene_statistics import (
+    band_scales,
+    compute_band_statistics,
+    load_band_statistics,
+    statistics_sidecar_for,
+)
+
+
+class TestSceneStatistics(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_scene_statistics")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.input_tif = self.tmp_dir / "input.tif"
+
+        self.data = np.random.randint(1, 1000, (4, 300, 300)).astype(np.uint16)
+        self.data[:, :50] = 0
+        self.data[0, 100, 100] = 4000
+        self.write_input()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_input(self):
+        with rasterio.open(
+            self.input_tif,
+            "w",
+            driver="GTiff",
+            height=300,
+            width=300,
+            count=4,
+            dtype="uint16",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 0.5, 0.5),
+            nodata=0,
+        ) as dst:
+            dst.write(self.data)
+
+    def test_compute_band_statistics(self):
+        with rasterio.open(self.input_tif) as src:
+            maxima = compute_band_statistics(src, percentile=100)
+            percentiles = compute_band_statistics(src, percentile=99)
+            decimated = compute_band_statistics(src, percentile=99, max_size=100)
+
+        self.assertEqual(maxima, [float(band.max()) for band in self.data])
+
+        valid = self.data[:, 50:].reshape(4, -1)
+        expected = [float(np.percentile(band, 99)) for band in valid]
+        self.assertEqual(percentiles, expected)
+
+        # The single bright pixel doesn't set the scale
+        self.assertLess(percentiles[0], 1000)
+        np.testing.assert_allclose(decimated, expected, rtol=0.05)
+
+    def test_statistics_are_cached_per_input_file(self):
+        with rasterio.open(self.input_tif) as src:
+            statistics = load_band_statistics(src)
+        self.assertTrue(statistics_sidecar_for(self.input_tif).exists())
+
+        with patch("scene_statistics.compute_band_statistics") as compute:
+            with rasterio.open(self.input_tif) as src:
+                self.assertEqual(load_band_statistics(src), statistics)
+            compute.assert_not_called()
+
+            # A rewritten input invalidates the cache
+            self.data[1:] //= 2
+            self.write_input()
+            stat = self.input_tif.stat()
+            os.utime(self.input_tif, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            compute.return_value = [1.0, 2.0, 3.0, 4.0]
+            with rasterio.open(self.input_tif) as src:
+                self.assertEqual(load_band_statistics(src), [1.0, 2.0, 3.0, 4.0])
+            compute.assert_called_once()
+
+    def test_band_scales(self):
+        scales = band_scales([255.0, 510.0, 0.0, 1000.0])
+
+        self.assertEqual(scales.dtype, np.float32)
+        np.testing.assert_allclose(scales, [1.0, 0.5, 1.0, 0.255])
+
+
+if __name__ == "__main__":
+    unittest.main()
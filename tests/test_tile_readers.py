@@ -0,0 +1,204 @@
+import unittest
+from pathlib import Path
+import shutil
+from unittest.mock import patch
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+from generate_prediction import get_tiles
+from tile_readers import (
+    MemmapRaster,
+    grid_matches,
+    group_windows_by_chunk,
+    iter_direct_tiles,
+    iter_memmap_tiles,
+    iter_source_tiles,
+    iter_warped_tiles,
+)
+
+
+class TestTileReaders(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_tile_readers")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.input_tif = self.tmp_dir / "input.tif"
+
+        self.data = np.random.randint(1, 255, (4, 640, 640)).astype(np.uint8)
+        with rasterio.open(
+            self.input_tif,
+            "w",
+            driver="GTiff",
+            height=640,
+            width=640,
+            count=4,
+            dtype="uint8",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 0.5, 0.5),
+            nodata=0,
+        ) as dst:
+            dst.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_grid_matches(self):
+        with rasterio.open(self.input_tif) as src:
+            profile = src.profile.copy()
+            self.assertTrue(grid_matches(src, profile))
+
+            profile["transform"] = from_origin(5, 0, 0.5, 0.5)
+            self.assertFalse(grid_matches(src, profile))
+
+            profile = src.profile.copy()
+            profile["crs"] = rasterio.crs.CRS.from_epsg(2875)
+            self.assertFalse(grid_matches(src, profile))
+
+    def test_group_windows_by_chunk(self):
+        tile_windows = [
+            Window(col, row, 256, 256)
+            for col in range(0, 1024, 128)
+            for row in range(0, 1024, 128)
+        ]
+
+        chunks = group_windows_by_chunk(tile_windows, chunk_size=512)
+
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(sum(len(w) for _, w in chunks), len(tile_windows))
+        self.assertEqual(chunks[0][0], Window(0, 0, 640, 640))
+
+    def test_direct_read_uses_source(self):
+        with rasterio.open(self.input_tif) as src:
+            tile_windows = [w for w, _ in get_tiles(src, stride=128)]
+            tiles = list(iter_source_tiles(src, src.profile.copy(), tile_windows))
+
+        self.assertEqual(len(tiles), len(tile_windows))
+        for window, tile_img in tiles:
+            row, col = int(window.row_off), int(window.col_off)
+            expected = self.data[:, row : row + window.height, col : col + window.width]
+            np.testing.assert_array_equal(tile_img, expected)
+
+    def test_chunked_warp_matches_per_tile_reads(self):
+        with rasterio.open(self.input_tif) as src:
+            # Target grid shifted by 10 pixels, so a warp is needed
+            profile = src.profile.copy()
+            profile["transform"] = from_origin(5, -5, 0.5, 0.5)
+            self.assertFalse(grid_matches(src, profile))
+
+            tile_windows = [
+                Window(col, row, 256, 256)
+                for col in range(0, 384, 128)
+                for row in range(0, 384, 128)
+            ]
+            warped = dict(
+                (tuple(w.flatten()), img)
+                for w, img in iter_warped_tiles(
+                    src, profile, tile_windows, chunk_size=256
+                )
+            )
+
+        self.assertEqual(len(warped), len(tile_windows))
+        for window in tile_windows:
+            row, col = int(window.row_off) + 10, int(window.col_off) + 10
+            expected = self.data[:, row : row + 256, col : col + 256]
+            np.testing.assert_array_equal(warped[tuple(window.flatten())], expected)
+
+    def test_chunked_warp_is_multithreaded(self):
+        vrts = []
+
+        def open_vrt(*args, **kwargs):
+            vrt = WarpedVRT(*args, **kwargs)
+            vrts.append(vrt)
+            return vrt
+
+        with rasterio.open(self.input_tif) as src:
+            profile = src.profile.copy()
+            profile["transform"] = from_origin(5, -5, 0.5, 0.5)
+
+            with patch("tile_readers.WarpedVRT", side_effect=open_vrt):
+                list(iter_warped_tiles(src, profile, [Window(0, 0, 256, 256)], num_threads=2))
+
+        (vrt,) = vrts
+        self.assertEqual(vrt.warp_extras["NUM_THREADS"], "2")
+        self.assertNotIn("warp_extras", vrt.warp_extras)
+
+    def test_border_windows_are_reflect_padded(self):
+        # Corner window hanging 64 pixels off the left and bottom edges
+        border = Window(-64, 448, 256, 256)
+        expected = np.pad(
+            self.data[:, 448:640, 0:192], ((0, 0), (0, 64), (64, 0)), mode="reflect"
+        )
+
+        with rasterio.open(self.input_tif) as src:
+            tile_windows = [w for w, _ in get_tiles(src, stride=128, edge_aware=True)]
+            self.assertIn(border, tile_windows)
+
+            profile = src.profile.copy()
+            image = MemmapRaster.open(src)
+
+            readers = [
+                iter_direct_tiles(src, tile_windows),
+                iter_warped_tiles(src, profile, tile_windows, chunk_size=256),
+                (
+                    (w, img.transpose(2, 0, 1))
+                    for w, img in iter_memmap_tiles(image, tile_windows)
+                ),
+            ]
+
+            for tiles in readers:
+                tiles = dict((tuple(w.flatten()), img) for w, img in tiles)
+                self.assertEqual(len(tiles), len(tile_windows))
+                for tile_img in tiles.values():
+                    self.assertEqual(tile_img.shape, (4, 256, 256))
+                np.testing.assert_array_equal(tiles[tuple(border.flatten())], expected)
+
+    def write_raster(self, path, **options):
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=640,
+            width=640,
+            count=4,
+            dtype="uint8",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 0.5, 0.5),
+            **options,
+        ) as dst:
+            dst.write(self.data)
+
+    def test_memmap_striped_and_tiled(self):
+        tiled_tif = self.tmp_dir / "tiled.tif"
+        self.write_raster(
+            tiled_tif, interleave="pixel", tiled=True, blockxsize=256, blockysize=256
+        )
+
+        windows = [Window(0, 0, 256, 256), Window(128, 384, 256, 256), Window(384, 512, 256, 128)]
+
+        for path, tiled in ((self.input_tif, False), (tiled_tif, True)):
+            with rasterio.open(path) as src:
+                image = MemmapRaster.open(src)
+                self.assertIsNotNone(image)
+                self.assertEqual(image.tiled, tiled)
+
+                for window in windows:
+                    expected = src.read((1, 2, 3, 4), window=window).transpose(1, 2, 0)
+                    np.testing.assert_array_equal(image.read(window), expected)
+
+    def test_memmap_unsupported_layouts(self):
+        compressed_tif = self.tmp_dir / "compressed.tif"
+        self.write_raster(compressed_tif, compress="deflate")
+
+        band_tif = self.tmp_dir / "band.tif"
+        self.write_raster(band_tif, interleave="band")
+
+        for path in (compressed_tif, band_tif):
+            with rasterio.open(path) as src:
+                self.assertIsNone(MemmapRaster.open(src))
+
+
+if __name__ == "__main__":
+    unittest.main()
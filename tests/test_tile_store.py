@@ -0,0 +1,144 @@
+import unittest
+from pathlib import Path
+import os
+import shutil
+import sys
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from generate_prediction import estimate_valid_windows, generate_prediction
+from pre_trained_model import PreTrainedModel, normalize_tiles
+import tile_store
+from tile_store import TileStore, write_tile_store
+
+
+def fake_predict(batch_input):
+    # Scores follow the input bands, so predictions depend on the input
+    batch_input = np.asarray(batch_input, dtype=np.float32)
+    preds = np.zeros(batch_input.shape[:3] + (10,), dtype=np.float32)
+    preds[..., :4] = batch_input
+    return preds
+
+
+class TestTileStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path("temp_test_tile_store")
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.input_tif = self.tmp_dir / "input.tif"
+
+        data = np.random.randint(1, 4000, (4, 640, 512)).astype(np.uint16)
+        data[:, :256, :256] = 0  # nodata corner
+        with rasterio.open(
+            self.input_tif,
+            "w",
+            driver="GTiff",
+            height=640,
+            width=512,
+            count=4,
+            dtype="uint16",
+            crs="EPSG:2230",
+            transform=from_origin(0, 0, 0.5, 0.5),
+            nodata=0,
+        ) as dst:
+            dst.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write_and_read_store(self):
+        store_dir = self.tmp_dir / "store"
+        with rasterio.open(self.input_tif) as src:
+            profile = src.profile.copy()
+            store = write_tile_store(
+                src, profile, estimate_valid_windows(src), store_dir, chunk_tiles=3
+            )
+
+            store = TileStore(store_dir)
+            self.assertGreater(len(store), 0)
+            self.assertEqual(store.profile["transform"], profile["transform"])
+            self.assertEqual(store.profile["crs"], profile["crs"])
+
+            for window, tile in zip(store.windows, store.tiles):
+                raw = src.read((1, 2, 3, 4), window=window)
+                self.assertNotEqual(np.average(raw), 0)
+                np.testing.assert_array_equal(tile, normalize_tiles([raw])[0])
+
+        batches = list(store.iter_batches(4))
+        self.assertEqual(sum(len(w) for w, _ in batches), len(store))
+        self.assertEqual(batches[0][1].shape[1:], (256, 256, 4))
+
+    @patch("tensorflow.keras.models.load_model")
+    def test_prediction_from_store_matches_source(self, mock_load_model):
+        mock_model = MagicMock()
+        mock_model.predict.side_effect = fake_predict
+        mock_load_model.return_value = mock_model
+        models = [PreTrainedModel("dummy_path")]
+
+        with rasterio.open(self.input_tif) as src:
+            profile = src.profile.copy()
+            valid_windows = estimate_valid_windows(src)
+            store = write_tile_store(
+                src, profile, valid_windows, self.tmp_dir / "store"
+            )
+
+            generate_prediction(
+                src,
+                profile,
+                self.tmp_dir / "from_source.tif",
+                models,
+                valid_windows,
+                stride=128,
+            )
+
+        generate_prediction(
+            None,
+            None,
+            self.tmp_dir / "from_store.tif",
+            models,
+            None,
+            stride=128,
+            tile_store=store,
+        )
+
+        with rasterio.open(self.tmp_dir / "from_source.tif") as a:
+            with rasterio.open(self.tmp_dir / "from_store.tif") as b:
+                self.assertEqual(a.transform, b.transform)
+                np.testing.assert_array_equal(a.read(1), b.read(1))
+
+    def test_changed_source_is_rejected(self):
+        store_dir = self.tmp_dir / "store"
+        with rasterio.open(self.input_tif) as src:
+            write_tile_store(src, src.profile.copy(), estimate_valid_windows(src), store_dir)
+
+        stat = self.input_tif.stat()
+        os.utime(self.input_tif, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with self.assertRaises(ValueError):
+            TileStore(store_dir)
+
+        # A store can still be used once its source is gone
+        self.input_tif.unlink()
+        self.assertGreater(len(TileStore(store_dir)), 0)
+
+    def test_main_stores_other_resolutions_on_model_grid(self):
+        input_tif = self.tmp_dir / "input_1ft.tif"
+        with rasterio.open(self.input_tif) as src:
+            profile = src.profile.copy()
+            profile.update(transform=from_origin(0, 0, 1.0, 1.0))
+            with rasterio.open(input_tif, "w", **profile) as dst:
+                dst.write(src.read())
+
+        store_dir = self.tmp_dir / "store_1ft"
+        with patch.object(sys, "argv", ["tile_store.py", str(input_tif), str(store_dir)]):
+            tile_store.main()
+
+        store = TileStore(store_dir)
+        self.assertEqual(store.profile["transform"].a, 0.5)
+        self.assertEqual((store.profile["width"], store.profile["height"]), (1024, 1280))
+        self.assertGreater(len(store), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,335 @@
+from collections import OrderedDict
+import math
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from rasterio import windows
+from rasterio.enums import Interleaving, Resampling
+from rasterio.vrt import WarpedVRT
+
+DEFAULT_INDEXES = (1, 2, 3, 4)
+
+
+def grid_matches(src, profile) -> bool:
+    """
+    Return True if `profile` describes the same pixel grid as `src`, in
+    which case tiles can be read from `src` directly without warping.
+    """
+    if profile.get("crs") is not None and profile["crs"] != src.crs:
+        return False
+
+    if profile["width"] != src.width or profile["height"] != src.height:
+        return False
+
+    return profile["transform"].almost_equals(src.transform)
+
+
+def select_tiles(tile_windows, tile_size: int = 256):
+    """
+    Return the windows that `generate_prediction` predicts: full size tiles.
+    """
+    return [
+        window
+        for window in tile_windows
+        if window.height == tile_size and window.width == tile_size
+    ]
+
+
+def clip_window(window: windows.Window, width: int, height: int) -> windows.Window:
+    """
+    Return the part of `window` inside a raster of `width` x `height`.
+    """
+    return window.intersection(windows.Window(0, 0, width, height))
+
+
+def pad_tile(
+    tile_img: np.ndarray,
+    window: windows.Window,
+    clipped: windows.Window,
+    channels_last: bool = False,
+) -> np.ndarray:
+    """
+    Reflect pad the pixels read at `clipped` out to the full `window`.
+
+    Windows extending past the raster edge are padded in memory, so border
+    tiles keep the same shape as interior tiles.
+    """
+    if clipped == window:
+        return tile_img
+
+    top = int(clipped.row_off - window.row_off)
+    left = int(clipped.col_off - window.col_off)
+    bottom = int(window.height) - top - int(clipped.height)
+    right = int(window.width) - left - int(clipped.width)
+
+    pad_width = [(top, bottom), (left, right)]
+    if channels_last:
+        pad_width = pad_width + [(0, 0)]
+    else:
+        pad_width = [(0, 0)] + pad_width
+
+    return np.pad(tile_img, pad_width, mode="reflect")
+
+
+def iter_direct_tiles(src, tile_windows, indexes=DEFAULT_INDEXES):
+    """
+    Read each window straight from the dataset, reflect padding windows
+    that extend past the raster edge.
+
+    Yields:
+        (window, tile_img) with tile_img of shape (bands, height, width)
+    """
+    for window in tile_windows:
+        clipped = clip_window(window, src.width, src.height)
+        yield window, pad_tile(src.read(indexes, window=clipped), window, clipped)
+
+
+def group_windows_by_chunk(tile_windows, chunk_size: int = 2048):
+    """
+    Group windows into square chunks of the target grid.
+
+    Windows are grouped by the chunk containing their upper left corner,
+    in the order each chunk is first seen. Windows starting before the
+    raster edge are grouped with the first chunk.
+
+    Returns:
+        List of (chunk_window, windows) where chunk_window is the union of
+        the windows in the chunk.
+    """
+    chunks = OrderedDict()
+
+    for window in tile_windows:
+        key = (
+            max(int(window.row_off), 0) // chunk_size,
+            max(int(window.col_off), 0) // chunk_size,
+        )
+        chunks.setdefault(key, []).append(window)
+
+    return [
+        (windows.union(*chunk_windows), chunk_windows)
+        for chunk_windows in chunks.values()
+    ]
+
+
+def iter_warped_tiles(
+    src,
+    profile,
+    tile_windows,
+    indexes=DEFAULT_INDEXES,
+    chunk_size: int = 2048,
+    resampling: Resampling = Resampling.nearest,
+    num_threads="ALL_CPUS",
+    warp_mem_limit: int = 256,
+):
+    """
+    Warp `src` onto the grid described by `profile` one chunk at a time and
+    slice the tiles out of each warped chunk.
+
+    Warping a large chunk once with multiple threads avoids paying the
+    warper's setup cost on every 256x256 window, and reads each source pixel
+    once instead of once per overlapping window. Windows extending past the
+    edge of the target grid are reflect padded.
+
+    Args:
+        chunk_size (int): Size of the chunks of the target grid to warp at once.
+        num_threads: Number of warper threads, or "ALL_CPUS".
+        warp_mem_limit (int): Warper working memory in MB.
+
+    Yields:
+        (window, tile_img) with tile_img of shape (bands, height, width)
+    """
+    vrt_options = {
+        "crs": profile["crs"],
+        "transform": profile["transform"],
+        "width": profile["width"],
+        "height": profile["height"],
+        "resampling": resampling,
+        "warp_mem_limit": warp_mem_limit,
+        # Extra keywords are passed to GDAL as warp options
+        "NUM_THREADS": str(num_threads),
+    }
+    if profile.get("nodata") is not None:
+        vrt_options["nodata"] = profile["nodata"]
+
+    with WarpedVRT(src, **vrt_options) as vrt:
+        for chunk_window, chunk_windows in group_windows_by_chunk(
+            tile_windows, chunk_size
+        ):
+            chunk_window = clip_window(chunk_window, vrt.width, vrt.height)
+            chunk = vrt.read(indexes, window=chunk_window)
+
+            for window in chunk_windows:
+                clipped = clip_window(window, vrt.width, vrt.height)
+                row = int(clipped.row_off - chunk_window.row_off)
+                col = int(clipped.col_off - chunk_window.col_off)
+
+                # Copy so tiles don't share memory with the chunk or each other
+                tile_img = np.array(
+                    chunk[:, row : row + int(clipped.height), col : col + int(clipped.width)]
+                )
+
+                yield window, pad_tile(tile_img, window, clipped)
+
+
+class MemmapRaster:
+    """
+    Zero-copy access to an uncompressed, pixel-interleaved GeoTIFF as a
+    NumPy memory map in (height, width, bands) order.
+
+    Striped files map to a single (H, W, bands) array and tiles are views
+    into it. Tiled files map to a (block rows, block cols, block height,
+    block width, bands) array and tiles are gathered into one array, copying
+    each pixel once.
+    """
+
+    def __init__(self, array: np.ndarray, width: int, height: int, tiled: bool):
+        self.array = array
+        self.width = width
+        self.height = height
+        self.tiled = tiled
+
+    @classmethod
+    def open(cls, src) -> Optional["MemmapRaster"]:
+        """
+        Memory map `src` if its layout allows it, otherwise return None.
+
+        Requires a local, uncompressed, pixel-interleaved GeoTIFF with a
+        single data type, full-byte samples and blocks stored contiguously
+        in row-major order.
+        """
+        if src.driver != "GTiff" or src.compression is not None:
+            return None
+        if src.interleaving != Interleaving.pixel or len(set(src.dtypes)) != 1:
+            return None
+        if src.tags(1, ns="IMAGE_STRUCTURE").get("NBITS"):
+            return None
+
+        path = Path(src.name)
+        if not path.is_file():
+            return None
+
+        with path.open("rb") as f:
+            byte_order = f.read(2)
+        if byte_order == b"II":
+            dtype = np.dtype(src.dtypes[0]).newbyteorder("<")
+        elif byte_order == b"MM":
+            dtype = np.dtype(src.dtypes[0]).newbyteorder(">")
+        else:
+            return None
+
+        block_height, block_width = src.block_shapes[0]
+        tiled = block_width != src.width
+        blocks_across = math.ceil(src.width / block_width)
+        blocks_down = math.ceil(src.height / block_height)
+
+        # TIFF pads edge tiles to the full tile size, but not the last strip
+        block_bytes = block_height * block_width * src.count * dtype.itemsize
+
+        offset = _block_offset(src, 0, 0)
+        if offset is None:
+            return None
+
+        for block_row in range(blocks_down):
+            for block_col in range(blocks_across):
+                index = block_row * blocks_across + block_col
+                if _block_offset(src, block_col, block_row) != offset + index * block_bytes:
+                    return None
+
+        if tiled:
+            shape = (blocks_down, blocks_across, block_height, block_width, src.count)
+        else:
+            shape = (src.height, src.width, src.count)
+
+        if path.stat().st_size < offset + math.prod(shape) * dtype.itemsize:
+            return None
+
+        array = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+        return cls(array, src.width, src.height, tiled)
+
+    def read(self, window: windows.Window, bands: int = 4) -> np.ndarray:
+        """
+        Return the first `bands` bands of `window` in (height, width, bands)
+        order, as a view for striped files or a gathered copy for tiled files.
+        """
+        row_start, col_start = int(window.row_off), int(window.col_off)
+        row_stop = row_start + int(window.height)
+        col_stop = col_start + int(window.width)
+
+        if not self.tiled:
+            return self.array[row_start:row_stop, col_start:col_stop, :bands]
+
+        _, _, block_height, block_width, _ = self.array.shape
+        tile_img = np.empty(
+            (row_stop - row_start, col_stop - col_start, bands), dtype=self.array.dtype
+        )
+
+        # Copy the part of each block overlapping the window straight into
+        # the output, so each pixel is copied once
+        for block_row in range(row_start // block_height, (row_stop - 1) // block_height + 1):
+            block_top = block_row * block_height
+            rows = slice(max(row_start, block_top), min(row_stop, block_top + block_height))
+
+            for block_col in range(col_start // block_width, (col_stop - 1) // block_width + 1):
+                block_left = block_col * block_width
+                cols = slice(max(col_start, block_left), min(col_stop, block_left + block_width))
+
+                tile_img[
+                    rows.start - row_start : rows.stop - row_start,
+                    cols.start - col_start : cols.stop - col_start,
+                ] = self.array[
+                    block_row,
+                    block_col,
+                    rows.start - block_top : rows.stop - block_top,
+                    cols.start - block_left : cols.stop - block_left,
+                    :bands,
+                ]
+
+        return tile_img
+
+
+def _block_offset(src, block_col: int, block_row: int) -> Optional[int]:
+    offset = src.get_tag_item(f"BLOCK_OFFSET_{block_col}_{block_row}", "TIFF", bidx=1)
+    return int(offset) if offset else None
+
+
+def iter_memmap_tiles(image: MemmapRaster, tile_windows, bands: int = 4):
+    """
+    Read each window from a memory mapped raster, reflect padding windows
+    that extend past the raster edge.
+
+    Yields:
+        (window, tile_img) with tile_img of shape (height, width, bands)
+    """
+    for window in tile_windows:
+        clipped = clip_window(window, image.width, image.height)
+        tile_img = image.read(clipped, bands=bands)
+        yield window, pad_tile(tile_img, window, clipped, channels_last=True)
+
+
+def iter_source_tiles(
+    src,
+    profile,
+    tile_windows,
+    indexes=DEFAULT_INDEXES,
+    chunk_size: int = 2048,
+    resampling: Resampling = Resampling.nearest,
+):
+    """
+    Read tiles on the grid described by `profile`, reading `src` directly
+    when no warp is needed and warping chunk by chunk with `resampling`
+    otherwise.
+    """
+    if grid_matches(src, profile):
+        return iter_direct_tiles(src, tile_windows, indexes=indexes)
+
+    return iter_warped_tiles(
+        src,
+        profile,
+        tile_windows,
+        indexes=indexes,
+        chunk_size=chunk_size,
+        resampling=resampling,
+    )
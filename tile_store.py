@@ -0,0 +1,262 @@
+"""
+Chunked on-disk store of preprocessed input tiles.
+
+Pre-tiling a scene once lets repeated runs over the same scene (e.g. when
+evaluating models) skip GDAL decompression, warping and per-tile
+normalization. The store is a directory holding:
+
+- tiles.bin: raw uint8 model inputs of shape (N, 256, 256, 4), contiguous
+  and in the order they are predicted
+- windows.npy: (N, 4) window col_off, row_off, width, height
+- metadata.json: georeferencing of the target grid and the source file's
+  path, size and modification time
+
+Batches are read through a memory map, so no decode work is done.
+
+Build a store with:
+    python tile_store.py input.tif store_dir
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+import rasterio
+from affine import Affine
+from rasterio import windows
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+
+from generate_prediction import estimate_valid_windows
+from pre_trained_model import normalize_tiles
+from resolution import model_grid_profile, resampling_for
+from scene_statistics import (
+    NORMALIZATION_MODES,
+    NORMALIZATION_SCENE,
+    NORMALIZATION_TILE,
+    scene_band_scales,
+)
+from tile_readers import iter_source_tiles, select_tiles
+
+TILES_FILE = "tiles.bin"
+WINDOWS_FILE = "windows.npy"
+METADATA_FILE = "metadata.json"
+
+
+def write_tile_store(
+    src,
+    profile,
+    tile_windows,
+    store_dir,
+    tile_size: int = 256,
+    chunk_tiles: int = 64,
+    band_scales=None,
+    resampling: Resampling = Resampling.nearest,
+) -> "TileStore":
+    """
+    Read, filter and normalize the tiles of `src` on the grid of `profile`
+    and write them to a tile store.
+
+    Tiles are skipped exactly as `generate_prediction` skips them, so the
+    store holds the tiles of one prediction run in scheduling order.
+
+    Args:
+        tile_windows: Candidate windows, e.g. from `estimate_valid_windows`.
+        store_dir: Directory to write the store to.
+        chunk_tiles (int): Number of tiles normalized and written at once.
+        band_scales: Optional scene normalization multipliers, see
+            `normalize_tiles`. Tiles are normalized per tile otherwise.
+        resampling: Resampling used when `profile` is not the grid of `src`,
+            see `resampling_for`.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    tile_windows = select_tiles(tile_windows, tile_size)
+
+    stored_windows = []
+    chunk_imgs = []
+
+    with (store_dir / TILES_FILE).open("wb") as tiles_file:
+
+        def flush_chunk():
+            tiles_file.write(
+                np.ascontiguousarray(normalize_tiles(chunk_imgs, scales=band_scales)).tobytes()
+            )
+            chunk_imgs.clear()
+
+        for window, tile_img in iter_source_tiles(
+            src, profile, tile_windows, resampling=resampling
+        ):
+            if np.average(tile_img) == profile["nodata"]:
+                continue
+
+            chunk_imgs.append(tile_img)
+            stored_windows.append(window)
+
+            if len(chunk_imgs) == chunk_tiles:
+                flush_chunk()
+
+        if chunk_imgs:
+            flush_chunk()
+
+    np.save(
+        store_dir / WINDOWS_FILE,
+        np.array(
+            [
+                (int(w.col_off), int(w.row_off), int(w.width), int(w.height))
+                for w in stored_windows
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 4),
+    )
+
+    source_path = Path(src.name)
+    source_stat = source_path.stat() if source_path.is_file() else None
+    metadata = {
+        "crs": profile["crs"].to_wkt() if profile["crs"] else None,
+        "transform": list(profile["transform"])[:6],
+        "width": profile["width"],
+        "height": profile["height"],
+        "nodata": profile["nodata"],
+        "tile_size": tile_size,
+        "count": len(stored_windows),
+        "band_scales": None if band_scales is None else [float(s) for s in band_scales],
+        "source": str(source_path.resolve()),
+        "source_size": source_stat.st_size if source_stat else None,
+        "source_mtime_ns": source_stat.st_mtime_ns if source_stat else None,
+    }
+    with (store_dir / METADATA_FILE).open("w") as f:
+        json.dump(metadata, f, indent=2)
+
+    return TileStore(store_dir)
+
+
+class TileStore:
+    """
+    Read-only access to a store written by `write_tile_store`.
+
+    Raises ValueError on open if the source raster still exists but has
+    changed since the store was written.
+    """
+
+    def __init__(self, store_dir) -> None:
+        self.store_dir = Path(store_dir)
+
+        with (self.store_dir / METADATA_FILE).open() as f:
+            self.metadata = json.load(f)
+
+        self.check_source()
+
+        self._windows = np.load(self.store_dir / WINDOWS_FILE)
+
+        tile_size = self.metadata["tile_size"]
+        if len(self._windows):
+            self.tiles = np.memmap(
+                self.store_dir / TILES_FILE,
+                dtype=np.uint8,
+                mode="r",
+                shape=(len(self._windows), tile_size, tile_size, 4),
+            )
+        else:
+            # numpy can't memory map an empty file
+            self.tiles = np.zeros((0, tile_size, tile_size, 4), dtype=np.uint8)
+
+    def check_source(self) -> None:
+        """
+        Raise ValueError if the source raster differs in size or
+        modification time from when the store was written.
+
+        A source that no longer exists is not checked, so a store can be
+        used on its own.
+        """
+        source = self.metadata.get("source")
+        if not source or not Path(source).is_file():
+            return
+
+        stat = Path(source).stat()
+        expected = (
+            ("size", self.metadata.get("source_size"), stat.st_size),
+            ("modification time", self.metadata.get("source_mtime_ns"), stat.st_mtime_ns),
+        )
+        for name, stored, current in expected:
+            # Stores from older versions don't record every field
+            if stored is not None and stored != current:
+                raise ValueError(
+                    f"Tile store {self.store_dir} is out of date: the {name} of "
+                    f"{source} has changed since it was written. Rebuild the store."
+                )
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    @property
+    def windows(self) -> list:
+        return [
+            windows.Window(col_off, row_off, width, height)
+            for col_off, row_off, width, height in self._windows.tolist()
+        ]
+
+    @property
+    def profile(self) -> dict:
+        """
+        Georeferencing of the grid the tiles were read on.
+        """
+        crs = self.metadata["crs"]
+        return {
+            "crs": CRS.from_wkt(crs) if crs else None,
+            "transform": Affine(*self.metadata["transform"]),
+            "width": self.metadata["width"],
+            "height": self.metadata["height"],
+            "nodata": self.metadata["nodata"],
+        }
+
+    def iter_batches(self, batch_size: int):
+        """
+        Yield (windows, tiles) batches in scheduling order.
+
+        `tiles` is a memory mapped view of shape (B, 256, 256, 4).
+        """
+        store_windows = self.windows
+
+        for start in range(0, len(self), batch_size):
+            stop = min(start + batch_size, len(self))
+            yield store_windows[start:stop], self.tiles[start:stop]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-tile a raster into a tile store.")
+    parser.add_argument("input", help="Input raster")
+    parser.add_argument("store_dir", help="Directory to write the tile store to")
+    parser.add_argument(
+        "--normalization",
+        choices=NORMALIZATION_MODES,
+        default=NORMALIZATION_TILE,
+        help="Scale each tile by its own band maxima, or by scene statistics.",
+    )
+    args = parser.parse_args()
+
+    with rasterio.open(args.input) as src:
+        profile = model_grid_profile(src)
+        valid_windows = estimate_valid_windows(src, profile=profile)
+
+        scales = None
+        if args.normalization == NORMALIZATION_SCENE:
+            scales = scene_band_scales(src)
+
+        store = write_tile_store(
+            src,
+            profile,
+            valid_windows,
+            args.store_dir,
+            band_scales=scales,
+            resampling=resampling_for(src),
+        )
+
+    print(f"Wrote {len(store)} tiles to {args.store_dir}")
+
+
+if __name__ == "__main__":
+    main()